@@ -0,0 +1,70 @@
+"""Time directory sync and delete with different worker counts.
+
+Usage: python -m benchmarks.bench_files [--latency SECONDS]
+
+With latency, every per-file compare, copy and unlink first sleeps
+that long, modeling the round trip of a network filesystem. A single
+worker deletes with shutil.rmtree, which the latency doesn't apply to.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from curricula.library import files
+
+
+def build(root: Path, directories: int, per_directory: int):
+    for i in range(directories):
+        directory = root.joinpath(f"d{i}")
+        directory.mkdir(parents=True)
+        for j in range(per_directory):
+            directory.joinpath(f"f{j}.txt").write_bytes(b"x" * 256)
+
+
+def delayed(function, latency: float):
+    def wrapper(*args, **kwargs):
+        time.sleep(latency)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def measure(label: str, function, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {elapsed * 1000:9.1f}ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--directories", type=int, default=50)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    options = parser.parse_args()
+
+    if options.latency:
+        files.sync_file = delayed(files.sync_file, options.latency)
+        files.remove_file = delayed(files.remove_file, options.latency)
+
+    root = Path(tempfile.mkdtemp(prefix="curricula-bench-"))
+    try:
+        source = root.joinpath("source")
+        build(source, options.directories, options.files)
+        print(f"{options.directories * options.files} files, {options.latency * 1000:g}ms latency")
+        for workers in options.workers:
+            print(f"workers={workers}")
+            destination = root.joinpath(f"copy{workers}")
+            measure("cold sync", files.sync_directory, source, destination, workers=workers)
+            measure("no-op sync", files.sync_directory, source, destination, workers=workers)
+            measure("delete", files.delete_directory, destination, workers=workers)
+    finally:
+        shutil.rmtree(str(root))
+
+
+if __name__ == "__main__":
+    main()
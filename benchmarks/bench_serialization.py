@@ -0,0 +1,86 @@
+"""Time dumping and loading reports with each installed JSON backend.
+
+Usage: python -m benchmarks.bench_serialization [--problems N] [--runtimes N]
+
+Documents are built from Assignment.dump() and Runtime.dump(), the two
+kinds of data curricula writes the most of.
+"""
+
+import argparse
+import io
+import timeit
+
+from curricula.library import serialization
+from curricula.library.process import Runtime
+from curricula.models import Assignment
+
+
+def assignment(problems: int) -> dict:
+    category = dict(weight="1", points="10", enabled=True)
+    return Assignment.load(dict(
+        short="hw1",
+        title="Homework 1",
+        authors=[dict(name="Author", email="author@example.com")],
+        grading=dict(points=100),
+        dates=dict(assigned="2020-01-01 00:00:00", due="2020-01-08 00:00:00", deadline=None),
+        problems=[
+            dict(
+                short=f"p{i}",
+                title=f"Problem {i}",
+                relative_path=f"p{i}",
+                grading=dict(weight="1", points="10", automated=category, review=category),
+                authors=[dict(name="Author", email="author@example.com")],
+                topics=["arrays", "recursion"],
+                notes="Notes " * 20)
+            for i in range(problems)])).dump()
+
+
+def runtimes(count: int) -> list:
+    output = ("line of output é\n" * 200).encode()
+    return [
+        Runtime(
+            args=("/usr/bin/test", str(i)),
+            cwd=None,
+            timeout=5,
+            code=0,
+            elapsed=0.01,
+            stdin=b"input",
+            stdout=output,
+            stderr=b"").dump()
+        for i in range(count)]
+
+
+def measure(label: str, function, number: int):
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number
+    print(f"  {label:<24} {best * 1000:9.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--problems", type=int, default=200)
+    parser.add_argument("--runtimes", type=int, default=500)
+    parser.add_argument("--number", type=int, default=20)
+    options = parser.parse_args()
+
+    documents = dict(assignment=assignment(options.problems), runtimes=runtimes(options.runtimes))
+    for name in serialization.BACKENDS:
+        try:
+            serialization.use(name)
+        except ImportError:
+            print(f"{name}: not installed")
+            continue
+
+        print(f"{name}:")
+        for label, document in documents.items():
+            text = io.StringIO()
+            serialization.dump(document, text)
+            encoded = text.getvalue()
+            measure(f"dump {label}", lambda: serialization.dump(document, io.StringIO()), options.number)
+            measure(f"dump {label} indented", lambda: serialization.dump(document, io.StringIO(), indent=2), options.number)
+            measure(f"load {label}", lambda: serialization.load(io.StringIO(encoded)), options.number)
+
+    serialization.use("json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import hashlib
+import marshal
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from . import serialization
+from ..log import log
+from ..version import version
+
+__all__ = ("private_directory", "default_directory", "cache_path", "read", "load")
+
+T = TypeVar("T")
+
+# Bump when the layout of cache files changes
+FORMAT = 1
+SUFFIX = ".cache"
+
+
+def private_directory(path: Path) -> bool:
+    """Create a directory only we can use, or check an existing one.
+
+    Returns False if the path is a link, not a directory, or owned by
+    someone else, in which case nothing in it should be trusted. Write
+    permission for others is removed from our own directories.
+    """
+
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = os.lstat(str(path))
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        return False
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(str(path), 0o700)
+    return True
+
+
+def default_directory() -> Path:
+    """Per-user cache directory for parsed JSON."""
+
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(root, "curricula", "json")
+
+
+def cache_path(path: Path, directory: Path = None) -> Path:
+    """Caches are named for the absolute path of their source.
+
+    They are kept out of the source tree so that they aren't picked up
+    when artifacts are copied or snapshotted.
+    """
+
+    digest = hashlib.sha256(str(path.absolute()).encode()).hexdigest()[:32]
+    return (directory or default_directory()).joinpath(f"{digest}-{path.name}{SUFFIX}")
+
+
+def fingerprint(path: Path, verify: bool) -> tuple:
+    """Everything that invalidates a cached result."""
+
+    info = path.stat()
+    digest = hashlib.sha256(path.read_bytes()).hexdigest() if verify else None
+    return FORMAT, marshal.version, version, info.st_mtime_ns, info.st_size, digest
+
+
+def write(path: Path, key: tuple, data: Any):
+    """Atomically replace the cache, giving up quietly if we can't."""
+
+    try:
+        descriptor, name = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix=".tmp")
+    except OSError as error:
+        log.debug(f"could not write cache {path}: {error}")
+        return
+
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(marshal.dumps((key, data)))
+        os.replace(name, str(path))
+    except (OSError, ValueError) as error:
+        log.debug(f"could not write cache {path}: {error}")
+        Path(name).unlink(missing_ok=True)
+
+
+def read(path: Path, verify: bool = False, update: bool = True, directory: Path = None) -> Any:
+    """Read a JSON file, preferring a fresh binary cache.
+
+    The cache holds the parsed data in marshal format, which decodes
+    several times faster than JSON. It is keyed by the source mtime
+    and size, the curricula and marshal versions, and a content hash
+    if verify is set. Stale caches fall back to JSON and are rewritten
+    if update is set.
+
+    Marshal is not secure against erroneous or maliciously constructed
+    data, so caches live in a per-user directory that only its owner
+    can write to, by default under XDG_CACHE_HOME, and are skipped if
+    the directory belongs to anyone else. Caches that fail to decode
+    are ignored, but a crafted file is not guaranteed to fail cleanly.
+    """
+
+    key = fingerprint(path, verify)
+    cached = cache_path(path, directory)
+    try:
+        usable = private_directory(cached.parent)
+    except OSError as error:
+        log.debug(f"not caching {path}: {error}")
+        usable = False
+    if not usable:
+        with path.open() as file:
+            return serialization.load(file)
+
+    try:
+        cached_key, data = marshal.loads(cached.read_bytes())
+        if cached_key == key:
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as error:
+        log.debug(f"ignoring unreadable cache {cached}: {error}")
+
+    with path.open() as file:
+        data = serialization.load(file)
+    if update:
+        write(cached, key, data)
+    return data
+
+
+def load(
+        path: Path,
+        decode: Callable[[Any], T],
+        verify: bool = False,
+        update: bool = True,
+        directory: Path = None) -> T:
+    """Read a JSON file through the cache and hydrate it with decode."""
+
+    return decode(read(path, verify=verify, update=update, directory=directory))
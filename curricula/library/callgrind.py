@@ -1,28 +1,124 @@
 import os
 import tempfile
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, Iterable
 
 from . import process
-from .files import delete_file
 
-__all__ = ("count",)
+__all__ = ("CallgrindFunction", "CallgrindReport", "parse", "count")
 
 
-def read_last_line(path: Path) -> Optional[str]:
-    """IR count appears at the end of the callgrind output."""
+@dataclass(eq=False)
+class CallgrindFunction:
+    """Costs attributed to a single function."""
 
-    with path.open("rb") as file:
-        if len(file.read(2)) < 2:
-            return None
+    name: str
 
-        file.seek(0)
-        file.seek(-2, os.SEEK_END)
-        while file.read(1) != b"\n":
-            file.seek(-2, os.SEEK_CUR)
-            if file.tell() == 0:
-                return None
-        return file.readlines()[-1].decode()
+    # Cost of the function body alone
+    exclusive: int = 0
+
+    # Cost of the function body and everything it calls
+    inclusive: int = 0
+
+    # Number of times the function was called
+    calls: int = 0
+
+    def dump(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(eq=False)
+class CallgrindReport:
+    """Per-function IR cost table from a callgrind output file."""
+
+    total: Optional[int] = None
+    functions: Dict[str, CallgrindFunction] = field(default_factory=dict)
+
+    def function(self, name: str) -> Optional[CallgrindFunction]:
+        """Look up a function by name."""
+
+        return self.functions.get(name)
+
+    def dump(self) -> dict:
+        return dict(
+            total=self.total,
+            functions={name: function.dump() for name, function in self.functions.items()})
+
+
+def parse(lines: Iterable[str]) -> CallgrindReport:
+    """Build a cost table from callgrind output in a single pass.
+
+    Only the first event, IR by default, is tracked. Cost lines that
+    follow a calls= line are the inclusive cost of that call and are
+    charged to the caller's inclusive cost; every other cost line is
+    charged to the current function's exclusive and inclusive cost.
+    Functions are keyed by name, so same-named static functions from
+    different files are merged.
+    """
+
+    report = CallgrindReport()
+    names = {}
+    positions = 1
+    summary = None
+    current = None
+    calling = False
+    callee = None
+
+    def resolve(value: str) -> str:
+        """Handle name compression, e.g. (12) main then (12)."""
+
+        value = value.strip()
+        if value.startswith("("):
+            identifier, _, name = value[1:].partition(")")
+            name = name.strip()
+            if name:
+                names[identifier] = name
+                return name
+            return names.get(identifier, identifier)
+        return value
+
+    def get(name: str) -> CallgrindFunction:
+        function = report.functions.get(name)
+        if function is None:
+            function = report.functions[name] = CallgrindFunction(name)
+        return function
+
+    for line in lines:
+        if not line or line[0] in "#\n":
+            continue
+
+        # Cost lines are by far the most common
+        if line[0].isdigit() or line[0] in "+-*":
+            if current is None:
+                continue
+            fields = line.split()
+            cost = int(fields[positions]) if len(fields) > positions else 0
+            if calling:
+                current.inclusive += cost
+                calling = False
+            else:
+                current.exclusive += cost
+                current.inclusive += cost
+
+        elif line.startswith("fn="):
+            current = get(resolve(line[3:]))
+        elif line.startswith("cfn="):
+            callee = get(resolve(line.partition("=")[2]))
+        elif line.startswith("calls="):
+            calling = True
+            if callee is not None:
+                callee.calls += int(line[6:].split(maxsplit=1)[0])
+        elif line.startswith("positions:"):
+            positions = len(line[10:].split())
+        elif line.startswith("totals:"):
+            report.total = int(line[7:].split()[0])
+        elif line.startswith("summary:"):
+            summary = int(line[8:].split()[0])
+
+    if report.total is None:
+        report.total = summary
+    return report
 
 
 def count(
@@ -30,28 +126,39 @@ def count(
         stdin: bytes = None,
         timeout: float = None,
         cwd: Path = None,
-        function_name: str = None) -> Tuple[process.Runtime, Optional[int]]:
-    """Run callgrind on the program and return IR count."""
+        function_name: str = None) -> Tuple[process.Runtime, Optional[CallgrindReport]]:
+    """Run callgrind on the program and return a cost report.
+
+    The total IR count is available as report.total, and the cost of
+    any function as report.function(name). If function_name is given,
+    collection is restricted to that function with --toggle-collect.
+    """
 
     extra_valgrind_args = []
     if function_name is not None:
         extra_valgrind_args.append(f"--toggle-collect={function_name}")
 
-    out_path = Path(next(tempfile._get_candidate_names()))
-    runtime = process.run(
-        "valgrind",
-        "--tool=callgrind",
-        f"--callgrind-out-file={out_path.parts[-1]}",
-        *extra_valgrind_args,
-        *args,
-        stdin=stdin,
-        timeout=timeout,
-        cwd=cwd)
-    if out_path.exists():
-        last_line = read_last_line(out_path)
-        if last_line is None:
+    descriptor, name = tempfile.mkstemp(prefix="curricula-", suffix=".callgrind.out")
+    os.close(descriptor)
+    out_path = Path(name)
+
+    try:
+        runtime = process.run(
+            "valgrind",
+            "--tool=callgrind",
+            f"--callgrind-out-file={out_path}",
+            *extra_valgrind_args,
+            *args,
+            stdin=stdin,
+            timeout=timeout,
+            cwd=cwd)
+        if out_path.stat().st_size == 0:
+            return runtime, None
+        with out_path.open() as file:
+            report = parse(file)
+        if report.total is None:
             return runtime, None
-        result = int(last_line.rsplit(maxsplit=1)[1])
-        delete_file(out_path)
-        return runtime, result
-    return runtime, None
+        return runtime, report
+
+    finally:
+        out_path.unlink(missing_ok=True)
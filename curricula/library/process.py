@@ -1,13 +1,28 @@
 import subprocess
+import selectors
+import base64
+import codecs
+import tempfile
+import select
+import asyncio
 import timeit
 import time
+import resource
+import signal
+import math
+import shutil
+import errno
+import sys
+import os
 
 from ..log import log
 from .debug import get_source_location
+from . import serialization
 
-from typing import Optional, Tuple, Callable, IO, TypeVar, Any
+from typing import Optional, Tuple, Callable, IO, TypeVar, Any, Iterable, Iterator, Dict
 from dataclasses import dataclass, asdict, field
 from contextlib import contextmanager
+from concurrent.futures import Executor, ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from functools import lru_cache
 from pathlib import Path
 
@@ -36,6 +51,47 @@ class ProcessError:
         return asdict(self)
 
 
+@dataclass(eq=False)
+class ProcessUsage:
+    """Resources consumed by a reaped child process."""
+
+    # CPU seconds spent in user and kernel mode
+    user_time: float
+    system_time: float
+
+    # Peak resident set size, in kilobytes on Linux
+    max_rss: int
+
+    minor_faults: int
+    major_faults: int
+    voluntary_switches: int
+    involuntary_switches: int
+
+    @classmethod
+    def from_rusage(cls, usage: resource.struct_rusage) -> "ProcessUsage":
+        """Convert from the struct returned by wait4."""
+
+        return ProcessUsage(
+            user_time=usage.ru_utime,
+            system_time=usage.ru_stime,
+            max_rss=usage.ru_maxrss,
+            minor_faults=usage.ru_minflt,
+            major_faults=usage.ru_majflt,
+            voluntary_switches=usage.ru_nvcsw,
+            involuntary_switches=usage.ru_nivcsw)
+
+    @property
+    def cpu_time(self) -> float:
+        """Total CPU seconds, unaffected by other load on the machine."""
+
+        return self.user_time + self.system_time
+
+    def dump(self) -> dict:
+        """Serialize."""
+
+        return asdict(self)
+
+
 T = TypeVar("T")
 
 
@@ -63,6 +119,56 @@ class ProcessCreation:
         return dump
 
 
+@dataclass(eq=False)
+class StreamEncoding:
+    """How captured bytes are represented when a process is dumped.
+
+    Only as much of each stream as survives truncation is decoded, so
+    huge outputs are never copied into a string in full. The format is
+    text, base64 for the raw bytes, or path, which leaves out streams
+    that were spilled to disk in favor of their file.
+    """
+
+    # Passed to bytes.decode, e.g. strict, replace, backslashreplace
+    errors: str = "replace"
+
+    # Maximum length of each encoded stream, zero for no limit
+    limit: int = serialization.LIMIT
+
+    # One of text, base64 or path
+    format: str = "text"
+
+    # Appended to text that was cut off
+    append: str = "..."
+
+    def encode(self, data: Optional[bytes], path: Optional[Path] = None) -> Optional[str]:
+        """Represent a stream in the configured format."""
+
+        if data is None or (self.format == "path" and path is not None):
+            return None
+        if self.format == "base64":
+            return self.encode_base64(data)
+        return self.decode(data)
+
+    def decode(self, data: bytes) -> str:
+        """Decode at most limit bytes, truncating like serialization."""
+
+        if self.limit <= 0 or len(data) <= self.limit:
+            return bytes.decode(data, errors=self.errors)
+
+        # Don't let a character split at the cut be replaced or raise
+        decoder = codecs.getincrementaldecoder("utf-8")(self.errors)
+        text = decoder.decode(memoryview(data)[:self.limit])
+        return text[:self.limit - len(self.append)] + self.append
+
+    def encode_base64(self, data: bytes) -> str:
+        """Encode as many whole bytes as fit within limit."""
+
+        if self.limit > 0:
+            data = memoryview(data)[:self.limit // 4 * 3]
+        return base64.b64encode(data).decode("ascii")
+
+
 @dataclass(eq=False)
 class ProcessStreams:
     """Container for streamed data."""
@@ -71,14 +177,18 @@ class ProcessStreams:
     stdout: Optional[bytes] = None
     stderr: Optional[bytes] = None
 
-    def dump(self) -> dict:
+    def dump(self, encoding: StreamEncoding = None) -> dict:
         """Decode any stream data from bytes."""
 
+        if encoding is None:
+            encoding = StreamEncoding()
+
         dump = getattr(super(), "dump", dict)()
         dump.update(
-            stdin=nullable(bytes.decode)(self.stdin),
-            stdout=nullable(bytes.decode)(self.stdout),
-            stderr=nullable(bytes.decode)(self.stderr))
+            stdin=encoding.encode(self.stdin),
+            stdout=encoding.encode(self.stdout, getattr(self, "stdout_path", None)),
+            stderr=encoding.encode(self.stderr, getattr(self, "stderr_path", None)),
+            stream_format=encoding.format)
         return dump
 
 
@@ -88,10 +198,10 @@ class Interaction(ProcessStreams, ProcessCreation):
 
     elapsed: Optional[float] = None
 
-    def dump(self) -> dict:
+    def dump(self, encoding: StreamEncoding = None) -> dict:
         """Make the runtime JSON serializable."""
 
-        dump = super().dump()
+        dump = super().dump(encoding)
         dump.update(elapsed=self.elapsed)
         return dump
 
@@ -114,16 +224,30 @@ class Runtime(ProcessStreams, ProcessCreation):
     raised_exception: bool = False
     exception: Optional[ProcessError] = None
 
-    def dump(self) -> dict:
+    # Output past the capture limit was not kept in memory
+    truncated: bool = False
+
+    # Output spilled to disk, complete unless it hit the spill limit
+    stdout_path: Optional[Path] = None
+    stderr_path: Optional[Path] = None
+
+    # Resources consumed, if the process was reaped by us
+    usage: Optional[ProcessUsage] = None
+
+    def dump(self, encoding: StreamEncoding = None) -> dict:
         """Make the runtime JSON serializable."""
 
-        dump = super().dump()
+        dump = super().dump(encoding)
         dump.update(elapsed=self.elapsed)
         dump.update(code=self.code)
         dump.update(timeout=self.timeout)
         dump.update(timed_out=self.timed_out)
         dump.update(raised_exception=self.raised_exception)
         dump.update(exception=self.exception.dump() if self.exception is not None else None)
+        dump.update(truncated=self.truncated)
+        dump.update(stdout_path=nullable(str)(self.stdout_path))
+        dump.update(stderr_path=nullable(str)(self.stderr_path))
+        dump.update(usage=self.usage.dump() if self.usage is not None else None)
         return dump
 
 
@@ -141,39 +265,83 @@ class Stream:
 
     file: IO[bytes]
 
+    # Keep at most this many trailing bytes of history, zero disables
+    history_limit: Optional[int] = None
+
     # Track all data passed through stream
-    history: bytes = field(init=False, default=b"")
+    history: bytearray = field(init=False, default_factory=bytearray)
+
+    # Number of bytes dropped from the front of the history
+    discarded: int = field(init=False, default=0)
+
+    @property
+    def position(self) -> int:
+        """Total bytes that have passed through the stream."""
+
+        return self.discarded + len(self.history)
+
+    def record(self, data: bytes):
+        """Append to the history, dropping old data past the limit."""
+
+        self.history += data
+        if self.history_limit is not None and len(self.history) > self.history_limit:
+            excess = len(self.history) - self.history_limit
+            del self.history[:excess]
+            self.discarded += excess
+
+    def since(self, position: int) -> bytes:
+        """Copy out only the history recorded after a position."""
+
+        with memoryview(self.history) as view:
+            return bytes(view[max(0, position - self.discarded):])
 
 
 @dataclass(eq=False)
 class Readable(Stream):
     """Custom IO stream for Interactive."""
 
-    # Poll rate for reading
-    POLL: float = 0.001
+    # Maximum bytes taken from the pipe per wakeup
+    CHUNK: int = 65536
 
     def _read_block(self, condition: Callable[[bytes], bool] = None, timeout: float = None) -> Optional[bytes]:
-        """Block until something besides None is returned."""
+        """Block until the pipe is readable and the condition passes.
 
-        buffer = b""
+        Rather than polling, we wait on a selector so that we only wake
+        up when there is data in the pipe. Data is accumulated in a
+        bytearray, which is what the condition is invoked on.
+        """
+
+        buffer = bytearray()
+        descriptor = self.file.fileno()
 
         timeout_time = None
         if timeout is not None:
             timeout_time = timeit.default_timer() + timeout
 
-        while True:
-            data = self.file.read()
-            if data is not None:
-                buffer += data
-                if condition is None or condition(buffer):
-                    break
-            if timeout is not None and timeit.default_timer() >= timeout_time:
-                self.history += buffer
-                raise TimeoutExpired(buffer=buffer)
-            time.sleep(self.POLL)
+        with selectors.DefaultSelector() as selector:
+            selector.register(descriptor, selectors.EVENT_READ)
+            while True:
+                remaining = None
+                if timeout_time is not None:
+                    remaining = max(0.0, timeout_time - timeit.default_timer())
+
+                if selector.select(timeout=remaining):
+                    data = os.read(descriptor, self.CHUNK)
+                    buffer += data
+                    if condition is None or condition(buffer):
+                        break
+
+                    # The pipe is closed so the condition can never pass
+                    if not data:
+                        self.record(buffer)
+                        raise TimeoutExpired(buffer=bytes(buffer))
+
+                elif timeout_time is not None and timeit.default_timer() >= timeout_time:
+                    self.record(buffer)
+                    raise TimeoutExpired(buffer=bytes(buffer))
 
-        self.history += buffer
-        return buffer
+        self.record(buffer)
+        return bytes(buffer)
 
     def read(
             self,
@@ -181,9 +349,11 @@ class Readable(Stream):
             timeout: float = None) -> Optional[bytes]:
         """Read from a stream.
 
-        If blocking is disabled, may return None. If condition is not
-        None, block until condition is satisfied. If timeout is not
-        None, break after timeout and return buffer or None.
+        If condition is None, return whatever is available once the
+        pipe becomes readable. Otherwise, block until condition is
+        satisfied. If timeout is not None, raise TimeoutExpired with
+        the partial buffer once it elapses. TimeoutExpired is also
+        raised if the pipe closes before the condition is satisfied.
         """
 
         return self._read_block(condition=condition, timeout=timeout)
@@ -203,7 +373,7 @@ class Writable(Stream):
 
         data = sep.join(values) + end
         self.file.write(data)
-        self.history += data
+        self.record(data)
         if flush:
             try:
                 self.file.flush()
@@ -212,21 +382,65 @@ class Writable(Stream):
 
 
 @dataclass(eq=False)
-class Interactive:
-    """An interactive runtime session."""
+class Session:
+    """Shared behavior for interactive sessions."""
 
     _args: Tuple[str, ...]
-    _process: subprocess.Popen
     _start_time: float
     cwd: Optional[Path]
+    stdin: Stream
+    stdout: Stream
+    stderr: Stream
+
+    _recording: Optional[Interaction] = None
+
+    @contextmanager
+    def recording(self) -> Interaction:
+        """Record a frame of all process streams."""
+
+        if self._recording is not None:
+            raise RuntimeError("Cannot make multiple runtime recordings at once!")
+
+        partial = Interaction(args=self._args, cwd=self.cwd)
+        stdin_position = self.stdin.position
+        stdout_position = self.stdout.position
+        stderr_position = self.stderr.position
+        start_time = timeit.default_timer()
+
+        yield partial
+
+        # Collect everything that changed
+        partial.elapsed = timeit.default_timer() - start_time
+        partial.stdin = self.stdin.since(stdin_position)
+        partial.stdout = self.stdout.since(stdout_position)
+        partial.stderr = self.stderr.since(stderr_position)
+
+    def _collect(self, stdout: bytes, stderr: bytes) -> dict:
+        """Fold the final output into history and build Runtime fields."""
+
+        self.stdout.record(stdout)
+        self.stderr.record(stderr)
+        return dict(
+            stdin=bytes(self.stdin.history),
+            stdout=bytes(self.stdout.history),
+            stderr=bytes(self.stderr.history),
+            truncated=any(stream.discarded > 0 for stream in (self.stdin, self.stdout, self.stderr)))
+
+
+@dataclass(eq=False, init=False)
+class Interactive(Session):
+    """An interactive runtime session."""
+
+    _process: subprocess.Popen
     stdin: Writable
     stdout: Readable
     stderr: Readable
 
-    _recording: Optional[Interaction] = None
+    def __init__(self, args: Tuple[str, ...], cwd: Path = None, history_limit: int = None):
+        """Start up the new process.
 
-    def __init__(self, args: Tuple[str, ...], cwd: Path = None):
-        """Start up the new process."""
+        The history_limit is passed to each stream, see Stream.
+        """
 
         self._args = args
         self._process = subprocess.Popen(
@@ -236,9 +450,9 @@ class Interactive:
             stdin=subprocess.PIPE,
             cwd=str(cwd) if cwd is not None else None)
         self.cwd = cwd
-        self.stdin = Writable(self._process.stdin)
-        self.stdout = Readable(self._process.stdout)
-        self.stderr = Readable(self._process.stderr)
+        self.stdin = Writable(self._process.stdin, history_limit=history_limit)
+        self.stdout = Readable(self._process.stdout, history_limit=history_limit)
+        self.stderr = Readable(self._process.stderr, history_limit=history_limit)
         self._start_time = timeit.default_timer()
 
     def poll(self) -> bool:
@@ -246,44 +460,35 @@ class Interactive:
 
         return self._process.poll() is None
 
-    @contextmanager
-    def recording(self) -> Interaction:
-        """Record a frame of all process streams."""
-
-        if self._recording is not None:
-            raise RuntimeError("Cannot make multiple runtime recordings at once!")
-
-        partial = Interaction(args=self._args, cwd=self.cwd)
-        stdin_index = len(self.stdin.history)
-        stdout_index = len(self.stdout.history)
-        stderr_index = len(self.stderr.history)
-        start_time = timeit.default_timer()
-
-        yield partial
-
-        # Collect everything that changed
-        partial.elapsed = timeit.default_timer() - start_time
-        partial.stdin = self.stdin.history[stdin_index:]
-        partial.stdout = self.stdout.history[stdout_index:]
-        partial.stderr = self.stderr.history[stderr_index:]
-
     def close(self, timeout: float = None) -> Runtime:
         """Block until exit."""
 
         raised_exception = False
         exception = None
         timed_out = False
-        stdout = b""
-        stderr = b""
+        usage = None
+        stdout_capture = Capture()
+        stderr_capture = Capture()
+        captures = {self._process.stdout.fileno(): stdout_capture, self._process.stderr.fileno(): stderr_capture}
+        deadline = timeit.default_timer() + timeout if timeout is not None else None
 
         try:
-            stdout, stderr = self._process.communicate(timeout=timeout)
+            if communicate(self._process, None, deadline, captures, stop_on_limit=False):
+                usage = reap(self._process, timeout=deadline - timeit.default_timer() if deadline is not None else None)
+            else:
+                timed_out = True
         except subprocess.TimeoutExpired:
             timed_out = True
         except OSError as error:
             raised_exception = True
             exception = ProcessError.from_os_error(error)
 
+        # Like Popen.communicate, leave the pipes open if we time out
+        if not timed_out:
+            for file in (self._process.stdin, self._process.stdout, self._process.stderr):
+                if file is not None:
+                    file.close()
+
         stop_time = timeit.default_timer()
         return Runtime(
             args=self._args,
@@ -291,43 +496,374 @@ class Interactive:
             timeout=timeout,
             code=self._process.returncode,
             elapsed=stop_time - self._start_time,
-            stdin=self.stdin.history,
-            stdout=self.stdout.history + stdout,
-            stderr=self.stderr.history + stderr,
             raised_exception=raised_exception,
             exception=exception,
-            timed_out=timed_out)
+            timed_out=timed_out,
+            usage=usage,
+            **self._collect(bytes(stdout_capture.buffer), bytes(stderr_capture.buffer)))
+
+
+# Sets rlimits from argv and then replaces itself with the command
+LIMITS_STUB = (
+    "import os, resource, sys\n"
+    "memory, cpu = sys.argv[1:3]\n"
+    "if memory:\n"
+    "    resource.setrlimit(resource.RLIMIT_AS, (int(memory), int(memory)))\n"
+    "if cpu:\n"
+    "    resource.setrlimit(resource.RLIMIT_CPU, (int(cpu), int(cpu) + 1))\n"
+    "os.execvp(sys.argv[3], sys.argv[3:])\n")
+
+
+@lru_cache(maxsize=None)
+def find_prlimit() -> Optional[str]:
+    """Locate the util-linux prlimit executable."""
+
+    return shutil.which("prlimit")
+
+
+@dataclass(eq=False)
+class ProcessLimits:
+    """Resource limits applied to a child before it executes.
+
+    Setting limits from a preexec_fn is unsafe once the parent has
+    threads, as it does in run_many, because the child can deadlock
+    before it gets to exec. The command is instead wrapped so that
+    prlimit, or a short Python stub where prlimit is missing, sets the
+    limits and then execs it in place. The process keeps its pid, so
+    it is reaped and measured as usual.
+    """
+
+    # Maximum address space in bytes
+    memory: Optional[int] = None
+
+    # Maximum CPU time in seconds, rounded up to a whole second
+    cpu: Optional[float] = None
+
+    def wrap(self, args: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Prefix a command with whatever sets the limits."""
+
+        seconds = math.ceil(self.cpu) if self.cpu is not None else None
+        prlimit = find_prlimit()
+        if prlimit is not None:
+            options = []
+            if self.memory is not None:
+                options.append(f"--as={self.memory}")
+            if seconds is not None:
+                options.append(f"--cpu={seconds}:{seconds + 1}")
+            return (prlimit, *options, "--", *args)
+
+        return (
+            sys.executable, "-S", "-c", LIMITS_STUB,
+            str(self.memory) if self.memory is not None else "",
+            str(seconds) if seconds is not None else "",
+            *args)
+
+
+def check_executable(executable: str, cwd: Optional[Path]) -> Optional[OSError]:
+    """Find the error exec would hit if we can't let it fail itself.
+
+    Only used when the command is wrapped, since the wrapper starts
+    fine and the failure would otherwise surface as an exit code.
+    """
+
+    if os.sep in executable and cwd is not None:
+        executable = os.path.join(str(cwd), executable)
+    if shutil.which(executable) is not None:
+        return None
+    if os.sep in executable and os.path.exists(executable):
+        return PermissionError(errno.EACCES, os.strerror(errno.EACCES), executable)
+    return FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), executable)
+
+
+# Bytes of each spilled stream kept in memory if no output_limit
+SPILL_BUFFER = 1 << 20
+
+# Bytes of each stream written to disk before the process is killed
+SPILL_LIMIT = 64 << 20
+
+
+@dataclass(eq=False)
+class ProcessSpec:
+    """Everything needed to invoke run later."""
+
+    args: Tuple[str, ...]
+    stdin: Optional[bytes] = None
+    timeout: Optional[float] = None
+    cwd: Optional[Path] = None
+    limits: Optional[ProcessLimits] = None
+    output_limit: Optional[int] = None
+    spill: bool = False
+    spill_limit: Optional[int] = SPILL_LIMIT
+    grace: float = 0.5
+
+
+@dataclass(eq=False)
+class Capture:
+    """Accumulates a single output stream up to a limit.
+
+    When spilling, the stream is also written to a file up to its own
+    limit, and only exceeding that one stops the process.
+    """
+
+    limit: Optional[int] = None
+    spill: Optional[IO[bytes]] = None
+    spill_limit: Optional[int] = None
+    buffer: bytearray = field(default_factory=bytearray)
+    spilled: int = 0
+    truncated: bool = False
+    overflowed: bool = False
+    closed: bool = False
+
+    # Maximum bytes taken from the pipe per wakeup
+    CHUNK: int = 65536
+
+    def feed(self, data: bytes) -> bool:
+        """Record data from the pipe, return whether to stop the process."""
+
+        if self.spill is not None:
+            if self.spill_limit is not None and self.spilled + len(data) > self.spill_limit:
+                data_on_disk = data[:self.spill_limit - self.spilled]
+                self.overflowed = True
+            else:
+                data_on_disk = data
+            self.spill.write(data_on_disk)
+            self.spilled += len(data_on_disk)
+
+        if self.limit is not None and len(self.buffer) + len(data) > self.limit:
+            self.buffer += data[:self.limit - len(self.buffer)]
+            self.truncated = True
+        else:
+            self.buffer += data
+        return self.overflowed if self.spill is not None else self.truncated
+
+
+def communicate(
+        process: subprocess.Popen,
+        stdin: Optional[bytes],
+        deadline: Optional[float],
+        captures: Dict[int, Capture],
+        stop_on_limit: bool,
+        session: bool = False) -> bool:
+    """Shuttle data to and from the process.
+
+    Returns True once every pipe has closed. Returns False early if the
+    deadline passes or, if stop_on_limit, any capture hits the limit
+    that stops the process. Unlike Popen.communicate, output is never held past the
+    limit of its capture.
+
+    If the process leads its own session, anything left in the session
+    is killed once the leader exits so that orphans holding the pipes
+    open can't stall us until the deadline.
+    """
+
+    exit_descriptor = None
+    if session and process.returncode is None:
+        try:
+            exit_descriptor = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            pass
+
+    with selectors.DefaultSelector() as selector:
+        for descriptor, capture in captures.items():
+            if not capture.closed:
+                selector.register(descriptor, selectors.EVENT_READ, capture)
+
+        view = memoryview(stdin if stdin is not None else b"")
+        offset = 0
+        if process.stdin is not None and not process.stdin.closed:
+            if stdin:
+                selector.register(process.stdin.fileno(), selectors.EVENT_WRITE, "stdin")
+            else:
+                process.stdin.close()
+
+        if exit_descriptor is not None:
+            selector.register(exit_descriptor, selectors.EVENT_READ, "exit")
+
+        try:
+            while any(key.data != "exit" for key in selector.get_map().values()):
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - timeit.default_timer()
+                    if remaining <= 0:
+                        return False
+
+                for key, _ in selector.select(timeout=remaining):
+                    if key.data == "exit":
+                        selector.unregister(key.fd)
+                        signal_group(process, signal.SIGKILL)
+                        continue
+
+                    if key.data == "stdin":
+                        try:
+                            offset += os.write(key.fd, view[offset:offset + select.PIPE_BUF])
+                        except BrokenPipeError:
+                            offset = len(view)
+                        if offset >= len(view):
+                            selector.unregister(key.fd)
+                            process.stdin.close()
+                        continue
+
+                    data = os.read(key.fd, key.data.CHUNK)
+                    if not data:
+                        key.data.closed = True
+                        selector.unregister(key.fd)
+                    elif key.data.feed(data) and stop_on_limit:
+                        return False
+
+        finally:
+            if exit_descriptor is not None:
+                os.close(exit_descriptor)
+
+    return True
+
+
+def reap(process: subprocess.Popen, timeout: float = None) -> Optional[ProcessUsage]:
+    """Reap the process with wait4 to collect its resource usage.
+
+    Behaves like Popen.wait, raising subprocess.TimeoutExpired if the
+    process does not exit in time. Where pidfd is available the wait
+    is event-driven, otherwise we fall back to polling with backoff.
+    Returns None if the process was already reaped elsewhere.
+    """
+
+    if process.returncode is not None:
+        return None
+
+    deadline = timeit.default_timer() + timeout if timeout is not None else None
+    try:
+        descriptor = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        descriptor = None
+
+    try:
+        delay = 0.0005
+        while True:
+            try:
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            except ChildProcessError:
+                return None
+            if pid != 0:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return ProcessUsage.from_rusage(usage)
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+
+            if descriptor is not None:
+                select.select((descriptor,), (), (), remaining)
+            else:
+                delay = min(delay * 2, 0.05, remaining if remaining is not None else 0.05)
+                time.sleep(delay)
+
+    finally:
+        if descriptor is not None:
+            os.close(descriptor)
+
+
+def exceeded_cpu_limit(code: Optional[int], usage: Optional[ProcessUsage], limits: Optional[ProcessLimits]) -> bool:
+    """Check whether the process was killed by RLIMIT_CPU."""
+
+    if limits is None or limits.cpu is None:
+        return False
+    if code == -signal.SIGXCPU:
+        return True
+    return code == -signal.SIGKILL and usage is not None and usage.cpu_time >= math.ceil(limits.cpu)
+
+
+def signal_group(process: subprocess.Popen, signal_number: int):
+    """Send a signal to the session started for the process."""
+
+    try:
+        os.killpg(process.pid, signal_number)
+    except ProcessLookupError:
+        pass
 
 
-def run(*args: str, stdin: bytes = None, timeout: float = None, cwd: Path = None) -> Runtime:
+def terminate(process: subprocess.Popen, grace: float = 0.5) -> Optional[ProcessUsage]:
+    """Terminate the process and anything it spawned, then reap it.
+
+    The process group is sent SIGTERM, and then SIGKILL if the leader
+    has not exited after the grace period. Any stragglers left in the
+    group are killed once the leader is reaped.
+    """
+
+    signal_group(process, signal.SIGTERM if grace > 0 else signal.SIGKILL)
+    try:
+        usage = reap(process, timeout=grace)
+    except subprocess.TimeoutExpired:
+        signal_group(process, signal.SIGKILL)
+        usage = reap(process)
+    signal_group(process, signal.SIGKILL)
+    return usage
+
+
+def run(
+        *args: str,
+        stdin: bytes = None,
+        timeout: float = None,
+        cwd: Path = None,
+        limits: ProcessLimits = None,
+        output_limit: int = None,
+        spill: bool = False,
+        spill_limit: int = SPILL_LIMIT,
+        grace: float = 0.5) -> Runtime:
     """Run an executable with a list of command line arguments.
 
     The provided path must be absolute in order to properly execute
     the program. Args provided are passed as they would be from the
     command line. The timeout is measured in seconds.
 
-    The process_setup callable is invoked within the spawned process
-    prior to the execution of the command.
+    The process is started in its own session. On timeout, the whole
+    group is sent SIGTERM and then SIGKILL after grace seconds, and the
+    process is always reaped before returning. Exceeding a CPU limit
+    counts as a timeout.
+
+    If limits are provided, they are applied within the spawned
+    process prior to the execution of the command, by way of prlimit
+    rather than preexec_fn so that run is safe to call from threads.
+
+    If output_limit is provided, at most that many bytes of stdout and
+    of stderr are kept, and the process is killed as soon as either
+    stream exceeds it. With spill, the output of each stream is instead
+    written to a temporary file referenced by the Runtime and owned by
+    the caller, only the first output_limit bytes are kept in memory,
+    SPILL_BUFFER if there is no output_limit, and the process is
+    allowed to continue until either file reaches spill_limit bytes.
+    Pass None as the spill_limit to write everything.
     """
 
     if timeout is None:
         log.warning(f"process.run has been invoked without a timeout from {get_source_location(2)}")
 
+    # Limits are set by a wrapper that execs the command
+    command = args
+    if limits is not None:
+        error = check_executable(args[0], cwd)
+        if error is not None:
+            exception = ProcessError.from_os_error(error)
+            return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, raised_exception=True, exception=exception)
+        command = limits.wrap(args)
+
     # Spawn the process, access stdout and stderr
     try:
         if stdin is not None:
             process = subprocess.Popen(
-                args,
+                command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 stdin=subprocess.PIPE,
-                cwd=str(cwd) if cwd is not None else None)
+                cwd=str(cwd) if cwd is not None else None,
+                start_new_session=True)
         else:
             process = subprocess.Popen(
-                args,
+                command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                cwd=str(cwd) if cwd is not None else None)
+                cwd=str(cwd) if cwd is not None else None,
+                start_new_session=True)
 
     # Catch common errors
     except OSError as error:
@@ -340,20 +876,65 @@ def run(*args: str, stdin: bytes = None, timeout: float = None, cwd: Path = None
         exception = ProcessError(description=str(exception))
         return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, raised_exception=True, exception=exception)
 
+    # Capture output as it comes in, spilling to disk if requested
+    if spill and output_limit is None:
+        output_limit = SPILL_BUFFER
+    stdout_capture = Capture(limit=output_limit)
+    stderr_capture = Capture(limit=output_limit)
+    if spill:
+        for capture, suffix in ((stdout_capture, ".stdout"), (stderr_capture, ".stderr")):
+            capture.spill = tempfile.NamedTemporaryFile(prefix="curricula-", suffix=suffix, delete=False)
+            capture.spill_limit = spill_limit
+    captures = {process.stdout.fileno(): stdout_capture, process.stderr.fileno(): stderr_capture}
+
     # Wait for the process to finish with timeout
     start = timeit.default_timer()
+    deadline = start + timeout if timeout is not None else None
     try:
-        stdout, stderr = process.communicate(input=stdin, timeout=timeout)
-    except subprocess.TimeoutExpired:
-        process.kill()
-
-        # Recover data
-        try:
-            stdout, stderr = process.communicate(timeout=1)
-        except subprocess.TimeoutExpired:
-            stdout, stderr = None, None
-
-        return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, stdout=stdout, stderr=stderr, timed_out=True)
+        usage = None
+        finished = communicate(process, stdin, deadline, captures, stop_on_limit=True, session=True)
+        if finished:
+            try:
+                usage = reap(process, timeout=deadline - timeit.default_timer() if deadline is not None else None)
+            except subprocess.TimeoutExpired:
+                finished = False
+
+        truncated = stdout_capture.truncated or stderr_capture.truncated
+        overflowed = stdout_capture.overflowed or stderr_capture.overflowed
+        timed_out = not finished and not (overflowed if spill else truncated)
+        truncated = truncated or overflowed
+        if not finished:
+            usage = terminate(process, grace=grace if timed_out else 0)
+
+            # Recover data
+            if timed_out:
+                communicate(process, None, timeit.default_timer() + 1, captures, stop_on_limit=True)
+
+        # Don't leave anything from the session running
+        signal_group(process, signal.SIGKILL)
+
+    finally:
+        if process.returncode is None:
+            terminate(process, grace=0)
+        for file in (process.stdin, process.stdout, process.stderr, stdout_capture.spill, stderr_capture.spill):
+            if file is not None:
+                file.close()
+
+    stdout_path = Path(stdout_capture.spill.name) if spill else None
+    stderr_path = Path(stderr_capture.spill.name) if spill else None
+    if timed_out:
+        return Runtime(
+            args=args,
+            cwd=cwd,
+            timeout=timeout,
+            stdin=stdin,
+            stdout=bytes(stdout_capture.buffer),
+            stderr=bytes(stderr_capture.buffer),
+            timed_out=True,
+            truncated=truncated,
+            stdout_path=stdout_path,
+            stderr_path=stderr_path,
+            usage=usage)
 
     # Check elapsed
     elapsed = timeit.default_timer() - start
@@ -364,11 +945,359 @@ def run(*args: str, stdin: bytes = None, timeout: float = None, cwd: Path = None
         code=process.returncode,
         elapsed=elapsed,
         stdin=stdin,
-        stdout=stdout,
-        stderr=stderr)
+        stdout=bytes(stdout_capture.buffer),
+        stderr=bytes(stderr_capture.buffer),
+        timed_out=exceeded_cpu_limit(process.returncode, usage, limits),
+        truncated=truncated,
+        stdout_path=stdout_path,
+        stderr_path=stderr_path,
+        usage=usage)
 
 
 def interact(*args: str) -> Interactive:
     """Shorthand for interactive, makes the interface nicer."""
 
     return Interactive(args=args)
+
+
+def run_many(
+        specs: Iterable[ProcessSpec],
+        parallelism: int = None,
+        limits: ProcessLimits = None) -> Iterator[Runtime]:
+    """Run many processes concurrently, yielding each as it finishes.
+
+    At most parallelism processes are alive at once, defaulting to the
+    CPU count. Specs are consumed lazily, so a generator of specs is
+    never materialized up front. The limits are used for any spec that
+    does not provide its own. Results come back in completion order;
+    each Runtime carries the args, stdin and cwd it was started with.
+    Limits are applied by exec'ing through a wrapper rather than from
+    a preexec_fn, which could deadlock the child in a threaded parent.
+    """
+
+    if parallelism is None:
+        parallelism = os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        yield from run_many_with(executor, specs, parallelism, limits)
+
+
+def run_many_with(
+        executor: Executor,
+        specs: Iterable[ProcessSpec],
+        parallelism: int,
+        limits: ProcessLimits = None) -> Iterator[Runtime]:
+    """Keep up to parallelism specs running on an executor.
+
+    Used by run_many, but any executor that can call run works, such
+    as a process pool. The executor is left running when we're done.
+    """
+
+    def submit(spec: ProcessSpec) -> Future:
+        return executor.submit(
+            run,
+            *spec.args,
+            stdin=spec.stdin,
+            timeout=spec.timeout,
+            cwd=spec.cwd,
+            limits=spec.limits if spec.limits is not None else limits,
+            output_limit=spec.output_limit,
+            spill=spec.spill,
+            spill_limit=spec.spill_limit,
+            grace=spec.grace)
+
+    specs = iter(specs)
+    pending = set()
+    for spec in specs:
+        pending.add(submit(spec))
+        if len(pending) >= parallelism:
+            break
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            spec = next(specs, None)
+            if spec is not None:
+                pending.add(submit(spec))
+            yield future.result()
+
+
+@dataclass(eq=False)
+class AsyncReadable(Stream):
+    """Awaitable counterpart to Readable."""
+
+    file: asyncio.StreamReader
+
+    # Maximum bytes taken from the pipe per wakeup
+    CHUNK: int = 65536
+
+    async def _read_block(self, condition: Callable[[bytes], bool] = None) -> bytes:
+        """Await data until the condition passes or the pipe closes."""
+
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self.file.read(self.CHUNK)
+                buffer += data
+                if condition is None or condition(buffer):
+                    return bytes(buffer)
+                if not data:
+                    raise TimeoutExpired(buffer=bytes(buffer))
+        finally:
+            self.record(buffer)
+
+    async def read(
+            self,
+            condition: Callable[[bytes], bool] = None,
+            timeout: float = None) -> bytes:
+        """Read from a stream with the same semantics as Readable."""
+
+        start = self.position
+        try:
+            return await asyncio.wait_for(self._read_block(condition=condition), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutExpired(buffer=self.since(start))
+
+
+@dataclass(eq=False)
+class AsyncWritable(Stream):
+    """Awaitable counterpart to Writable."""
+
+    file: asyncio.StreamWriter
+
+    async def write(
+            self,
+            *values: bytes,
+            sep: bytes = b" ",
+            end: bytes = b"\n",
+            flush: bool = True):
+        """Write to the stream like traditional print."""
+
+        data = sep.join(values) + end
+        self.file.write(data)
+        self.record(data)
+        if flush:
+            try:
+                await self.file.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+
+async def async_drain(reader: Optional[asyncio.StreamReader], buffer: bytearray):
+    """Read a stream to EOF, keeping what arrived if cancelled."""
+
+    if reader is None:
+        return
+    while True:
+        data = await reader.read(Capture.CHUNK)
+        if not data:
+            return
+        buffer += data
+
+
+async def async_communicate(
+        process: asyncio.subprocess.Process,
+        stdin: Optional[bytes],
+        stdout: bytearray,
+        stderr: bytearray):
+    """Like Process.communicate, but output survives cancellation."""
+
+    async def feed():
+        if process.stdin is None:
+            return
+        try:
+            if stdin:
+                process.stdin.write(stdin)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+
+    await asyncio.gather(feed(), async_drain(process.stdout, stdout), async_drain(process.stderr, stderr))
+    await process.wait()
+
+
+def close_pipes(process: asyncio.subprocess.Process):
+    """Close the pipes of a process whose output we've given up on.
+
+    Nothing public does this, so we go through the transport the event
+    loop keeps on the process, if this version of asyncio still has it.
+    """
+
+    transport = getattr(process, "_transport", None)
+    if transport is not None and hasattr(transport, "close"):
+        transport.close()
+
+
+async def async_terminate(process: asyncio.subprocess.Process, communication: asyncio.Future):
+    """Kill the session after a timeout and reap the process.
+
+    Output is recovered for up to a second, after which we give up on
+    anything still holding the pipes open.
+    """
+
+    signal_group(process, signal.SIGKILL)
+    try:
+        await asyncio.wait_for(asyncio.shield(communication), timeout=1)
+    except asyncio.TimeoutError:
+        communication.cancel()
+        try:
+            await communication
+        except asyncio.CancelledError:
+            pass
+        close_pipes(process)
+    await process.wait()
+
+
+@dataclass(eq=False, init=False)
+class AsyncInteractive(Session):
+    """An interactive runtime session driven by an event loop.
+
+    Use AsyncInteractive.start or async_interact to create a session,
+    since spawning the process has to be awaited.
+    """
+
+    _process: asyncio.subprocess.Process
+    stdin: AsyncWritable
+    stdout: AsyncReadable
+    stderr: AsyncReadable
+
+    def __init__(
+            self,
+            args: Tuple[str, ...],
+            process: asyncio.subprocess.Process,
+            cwd: Path = None,
+            history_limit: int = None):
+        """Wrap an already running process."""
+
+        self._args = args
+        self._process = process
+        self.cwd = cwd
+        self.stdin = AsyncWritable(process.stdin, history_limit=history_limit)
+        self.stdout = AsyncReadable(process.stdout, history_limit=history_limit)
+        self.stderr = AsyncReadable(process.stderr, history_limit=history_limit)
+        self._start_time = timeit.default_timer()
+
+    @classmethod
+    async def start(cls, args: Tuple[str, ...], cwd: Path = None, history_limit: int = None) -> "AsyncInteractive":
+        """Start up the new process."""
+
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.PIPE,
+            cwd=str(cwd) if cwd is not None else None,
+            start_new_session=True)
+        return cls(args=args, process=process, cwd=cwd, history_limit=history_limit)
+
+    def poll(self) -> bool:
+        """Check whether the interactive has terminated."""
+
+        return self._process.returncode is None
+
+    async def close(self, timeout: float = None) -> Runtime:
+        """Close stdin and await exit.
+
+        Unlike Interactive.close, the process and its session are killed
+        if it does not exit within the timeout so that it is not left
+        attached to the event loop. Output read before then is kept.
+        """
+
+        raised_exception = False
+        exception = None
+        timed_out = False
+        stdout = bytearray()
+        stderr = bytearray()
+
+        communication = asyncio.ensure_future(async_communicate(self._process, None, stdout, stderr))
+        try:
+            await asyncio.wait_for(asyncio.shield(communication), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await async_terminate(self._process, communication)
+        except OSError as error:
+            raised_exception = True
+            exception = ProcessError.from_os_error(error)
+
+        stop_time = timeit.default_timer()
+        return Runtime(
+            args=self._args,
+            cwd=self.cwd,
+            timeout=timeout,
+            code=self._process.returncode,
+            elapsed=stop_time - self._start_time,
+            raised_exception=raised_exception,
+            exception=exception,
+            timed_out=timed_out,
+            **self._collect(bytes(stdout), bytes(stderr)))
+
+
+async def async_run(*args: str, stdin: bytes = None, timeout: float = None, cwd: Path = None) -> Runtime:
+    """Run an executable on the event loop.
+
+    Behaves exactly like run and returns the same Runtime, but only
+    occupies the event loop rather than a thread while waiting. On
+    timeout, everything in the process's session is killed.
+    """
+
+    if timeout is None:
+        log.warning(f"process.async_run has been invoked without a timeout from {get_source_location(2)}")
+
+    # Spawn the process, access stdout and stderr
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else None,
+            cwd=str(cwd) if cwd is not None else None,
+            start_new_session=True)
+
+    # Catch common errors
+    except OSError as error:
+        exception = ProcessError.from_os_error(error)
+        return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, raised_exception=True, exception=exception)
+    except ValueError:
+        exception = ProcessError(description="failed to open process")
+        return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, raised_exception=True, exception=exception)
+    except subprocess.SubprocessError as exception:
+        exception = ProcessError(description=str(exception))
+        return Runtime(args=args, cwd=cwd, timeout=timeout, stdin=stdin, raised_exception=True, exception=exception)
+
+    # Wait for the process to finish with timeout
+    start = timeit.default_timer()
+    stdout = bytearray()
+    stderr = bytearray()
+    communication = asyncio.ensure_future(async_communicate(process, stdin, stdout, stderr))
+    try:
+        await asyncio.wait_for(asyncio.shield(communication), timeout=timeout)
+    except asyncio.TimeoutError:
+        await async_terminate(process, communication)
+        return Runtime(
+            args=args,
+            cwd=cwd,
+            timeout=timeout,
+            stdin=stdin,
+            stdout=bytes(stdout),
+            stderr=bytes(stderr),
+            timed_out=True)
+
+    # Check elapsed
+    elapsed = timeit.default_timer() - start
+    return Runtime(
+        args=args,
+        cwd=cwd,
+        timeout=timeout,
+        code=process.returncode,
+        elapsed=elapsed,
+        stdin=stdin,
+        stdout=bytes(stdout),
+        stderr=bytes(stderr))
+
+
+async def async_interact(*args: str) -> AsyncInteractive:
+    """Shorthand for AsyncInteractive.start."""
+
+    return await AsyncInteractive.start(args=args)
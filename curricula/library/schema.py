@@ -0,0 +1,283 @@
+import dataclasses
+import typing
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Type, TypeVar
+
+__all__ = ("SchemaError", "Schema", "convert")
+
+T = TypeVar("T")
+
+# Converts a JSON value into a model value
+Decoder = Callable[[Any], Any]
+
+MISSING = dataclasses.MISSING
+
+# Primitives that are checked inline rather than with a call
+PRIMITIVES = {
+    str: "string",
+    bool: "boolean",
+    dict: "object",
+}
+
+
+class SchemaError(ValueError):
+    """Raised when serialized data does not match a model."""
+
+    path: str
+    message: str
+
+    def __init__(self, path: str, message: str):
+        super().__init__(f"{path or '<root>'}: {message}")
+        self.path = path
+        self.message = message
+
+    def within(self, key: str) -> "SchemaError":
+        """Prefix the path as the error propagates out of a container."""
+
+        if not self.path:
+            path = key
+        elif self.path.startswith("["):
+            path = f"{key}{self.path}"
+        else:
+            path = f"{key}.{self.path}"
+        return SchemaError(path, self.message)
+
+
+def mismatch(expected: str, value: Any) -> SchemaError:
+    """Shorthand for a type error at the current path."""
+
+    return SchemaError("", f"expected {expected}, got {type(value).__name__}")
+
+
+def decode_int(value: Any) -> int:
+    """Integers, but not booleans.
+
+    Floats with no fractional part, e.g. 100.0, are accepted and
+    converted, since the old loader let them through unchecked.
+    """
+
+    if type(value) is int:
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    if type(value) is float:
+        raise SchemaError("", f"expected integer, got {value!r}")
+    raise mismatch("integer", value)
+
+
+def decode_float(value: Any) -> float:
+    """Either kind of JSON number."""
+
+    if type(value) is not float and type(value) is not int:
+        raise mismatch("number", value)
+    return value
+
+
+def decode_decimal(value: Any) -> Decimal:
+    """Decimals are usually serialized as strings."""
+
+    if type(value) is not str and type(value) is not int and type(value) is not float:
+        raise mismatch("decimal", value)
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise SchemaError("", f"invalid decimal {value!r}")
+
+
+def convert(function: Callable[[Any], T], kind: type, name: str) -> Decoder:
+    """Check the primitive type and then apply a conversion."""
+
+    def decode(value: Any) -> T:
+        if type(value) is not kind:
+            raise mismatch(name, value)
+        try:
+            return function(value)
+        except ValueError as error:
+            raise SchemaError("", str(error))
+
+    return decode
+
+
+def list_of(item: Decoder) -> Decoder:
+    """Decode each element, reporting the index of a bad one."""
+
+    def decode(value: Any) -> list:
+        if type(value) is not list:
+            raise mismatch("array", value)
+        try:
+            return [item(element) for element in value]
+        except SchemaError:
+            for i, element in enumerate(value):
+                try:
+                    item(element)
+                except SchemaError as error:
+                    raise error.within(f"[{i}]") from None
+            raise
+
+    return decode
+
+
+class Schema:
+    """Compiles dataclass models into specialized decode functions.
+
+    Each model class is compiled once, like dataclass compiles its
+    __init__, into straight-line code that checks and converts every
+    field without mutating its input. Nested models, Optional and List
+    are handled recursively, and anything else is looked up in the
+    provided decoders. Fields whose metadata has load=False, such as
+    backlinks, are skipped. Paths for error messages are only built
+    once something fails.
+
+    Instances are created with object.__new__, skipping __init__ like
+    unpickling does. __post_init__ is invoked if defined, followed by a
+    loaded() hook so that models can fill in backlinks or derived
+    defaults.
+    """
+
+    decoders: Dict[Any, Decoder]
+    loaders: Dict[type, Decoder]
+
+    def __init__(self, decoders: Dict[Any, Decoder] = None):
+        """Start with decoders for JSON primitives."""
+
+        self.decoders = {
+            int: decode_int,
+            float: decode_float,
+            Decimal: decode_decimal,
+            Any: lambda value: value,
+        }
+        if decoders is not None:
+            self.decoders.update(decoders)
+        self.loaders = {}
+
+    def decoder(self, annotation: Any) -> Decoder:
+        """Build a standalone decoder for a type annotation."""
+
+        if annotation in self.decoders:
+            return self.decoders[annotation]
+
+        if annotation in PRIMITIVES:
+            def decode(value: Any) -> Any:
+                if type(value) is not annotation:
+                    raise mismatch(PRIMITIVES[annotation], value)
+                return value
+            return decode
+
+        origin = typing.get_origin(annotation)
+        arguments = typing.get_args(annotation)
+
+        if origin is typing.Union and len(arguments) == 2 and type(None) in arguments:
+            inner = self.decoder(arguments[0] if arguments[1] is type(None) else arguments[1])
+            return lambda value: None if value is None else inner(value)
+
+        if origin is list:
+            return list_of(self.decoder(arguments[0]) if arguments else self.decoders[Any])
+
+        if origin is dict:
+            return self.decoder(dict)
+
+        if dataclasses.is_dataclass(annotation):
+            return self.loader(annotation)
+
+        raise TypeError(f"no decoder for {annotation!r}")
+
+    def emit(self, annotation: Any, namespace: dict, indent: str) -> List[str]:
+        """Generate statements that convert the local named value."""
+
+        if annotation in PRIMITIVES:
+            return [
+                f"{indent}if type(value) is not {namespace_name(namespace, annotation)}:",
+                f"{indent}    raise mismatch({PRIMITIVES[annotation]!r}, value)"]
+
+        origin = typing.get_origin(annotation)
+        arguments = typing.get_args(annotation)
+        if origin is typing.Union and len(arguments) == 2 and type(None) in arguments:
+            inner = arguments[0] if arguments[1] is type(None) else arguments[1]
+            return [f"{indent}if value is not None:"] + self.emit(inner, namespace, indent + "    ")
+
+        decoder = self.decoder(annotation)
+        return [f"{indent}value = {namespace_name(namespace, decoder)}(value)"]
+
+    def loader(self, cls: Type[T]) -> Callable[[Any], T]:
+        """Get or compile the decode function for a model."""
+
+        loader = self.loaders.get(cls)
+        if loader is None:
+
+            # Recursive models resolve to the compiled loader later
+            self.loaders[cls] = lambda data: self.loaders[cls](data)
+            loader = self.loaders[cls] = self.compile(cls)
+
+        return loader
+
+    def compile(self, cls: Type[T]) -> Callable[[Any], T]:
+        """Generate and execute a specialized decode function."""
+
+        hints = typing.get_type_hints(cls)
+        namespace = dict(
+            cls=cls,
+            new=object.__new__,
+            setter=object.__setattr__,
+            MISSING=MISSING,
+            SchemaError=SchemaError,
+            mismatch=mismatch)
+
+        lines = [
+            "def load(data):",
+            "    if type(data) is not dict:",
+            "        raise mismatch('object', data)",
+            "    self = new(cls)",
+            "    get = data.get"]
+
+        for f in dataclasses.fields(cls):
+            if f.default is not MISSING:
+                fallback = [f"        value = {namespace_name(namespace, f.default)}"]
+            elif f.default_factory is not MISSING:
+                fallback = [f"        value = {namespace_name(namespace, f.default_factory)}()"]
+            else:
+                fallback = [f"        raise SchemaError({f.name!r}, 'missing required field')"]
+
+            if not f.metadata.get("load", True):
+                lines.extend(line[4:] for line in fallback)
+            else:
+                lines.append(f"    value = get({f.name!r}, MISSING)")
+                lines.append("    if value is MISSING:")
+                lines.extend(fallback)
+                lines.append("    else:")
+                lines.append("        try:")
+                lines.extend(self.emit(hints[f.name], namespace, "            "))
+                lines.append("        except SchemaError as error:")
+                lines.append(f"            raise error.within({f.name!r}) from None")
+            lines.append(f"    setter(self, {f.name!r}, value)")
+
+        if hasattr(cls, "__post_init__"):
+            lines.append("    self.__post_init__()")
+        if hasattr(cls, "loaded"):
+            lines.append("    self.loaded()")
+        lines.append("    return self")
+
+        exec("\n".join(lines), namespace)
+        load = namespace["load"]
+        load.__qualname__ = f"load_{cls.__name__}"
+        return load
+
+    def load(self, cls: Type[T], data: Any) -> T:
+        """Decode a single model."""
+
+        return self.loader(cls)(data)
+
+    def load_many(self, cls: Type[T], items: Iterable[Any]) -> List[T]:
+        """Decode many models with the same compiled function."""
+
+        return list_of(self.loader(cls))(items if type(items) is list else list(items))
+
+
+def namespace_name(namespace: dict, value: Any) -> str:
+    """Bind a value into generated code, returning its local name."""
+
+    for name, existing in namespace.items():
+        if existing is value:
+            return name
+    name = f"_{len(namespace)}"
+    namespace[name] = value
+    return name
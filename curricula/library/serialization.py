@@ -1,5 +1,35 @@
+import datetime
 import json
-from typing import Any, TextIO
+import json.encoder
+from decimal import Decimal
+from pathlib import PurePath
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO, Union
+
+__all__ = (
+    "truncate",
+    "descend_and_truncate",
+    "truncated",
+    "default",
+    "Backend",
+    "OrjsonBackend",
+    "UjsonBackend",
+    "backend",
+    "use",
+    "TruncatingEncoder",
+    "iterencode",
+    "dump",
+    "dump_lines",
+    "load",
+    "load_lines")
+
+# Strings in dumped reports are cut off at this length by default
+LIMIT = 100_000
+
+# Containers nested this deep are written member by member
+STREAMING_DEPTH = 3
+
+# Standard format for datetimes in serialized models
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 def truncate(string: str, length: int, append: str = "...") -> str:
@@ -28,15 +58,379 @@ def descend_and_truncate(o: Any, length: int, append: str = "..."):
     return o
 
 
+def truncated(o: Any, length: int, append: str = "...") -> Any:
+    """Copy the containers of a JSON object with strings truncated.
+
+    Strings that fit are shared with the original rather than copied.
+    Keys are truncated too, matching TruncatingEncoder.
+    """
+
+    kind = type(o)
+    if kind is str:
+        return truncate(o, length, append)
+    if kind is dict:
+        return {truncated(key, length, append): truncated(value, length, append) for key, value in o.items()}
+    if kind is list or kind is tuple:
+        return [truncated(item, length, append) for item in o]
+    if isinstance(o, str):
+        return truncate(o, length, append)
+    if isinstance(o, dict):
+        return {truncated(key, length, append): truncated(value, length, append) for key, value in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [truncated(item, length, append) for item in o]
+    return o
+
+
+def default(o: Any) -> Any:
+    """Serialize the types used by models the same way they do."""
+
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, datetime.datetime):
+        return o.strftime(DATETIME_FORMAT)
+    if isinstance(o, PurePath):
+        return str(o)
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+class Backend:
+    """The standard library json module.
+
+    Faster backends override loads and dumps. Their dumps returns None
+    when it can't honor the requested options, in which case the
+    streaming encoder is used. Documents a fast backend fails on, such
+    as NaN or huge integers, are also retried with the standard
+    library, so all backends accept and produce the same data. Only
+    whitespace and escaping may differ: fast backends write compact,
+    unescaped UTF-8 and NaN as null, which is why they are only used
+    once selected with use. Types the standard library can't encode,
+    such as dataclasses, go through default with every backend, with
+    the exception of enums and UUIDs, which orjson always encodes.
+    """
+
+    name = "json"
+    fast = False
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Parse a whole document."""
+
+        return json.loads(data)
+
+    def dumps(self, o: Any, options: Dict[str, Any]) -> Optional[str]:
+        """Encode a whole document, or None to stream instead."""
+
+        return None
+
+
+class OrjsonBackend(Backend):
+    """Uses orjson, which encodes to and decodes from UTF-8 bytes."""
+
+    name = "orjson"
+    fast = True
+
+    def __init__(self):
+        """Fails with ImportError if orjson is not installed."""
+
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self.orjson.loads(data)
+        except self.orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def dumps(self, o: Any, options: Dict[str, Any]) -> Optional[str]:
+        flags = (
+            self.orjson.OPT_NON_STR_KEYS
+            | self.orjson.OPT_PASSTHROUGH_DATETIME
+            | self.orjson.OPT_PASSTHROUGH_DATACLASS)
+        for key, value in options.items():
+            if key == "indent" and value == 2:
+                flags |= self.orjson.OPT_INDENT_2
+            elif key == "sort_keys" and value:
+                flags |= self.orjson.OPT_SORT_KEYS
+            elif key not in ("default", "ensure_ascii") and value not in (None, False):
+                return None
+        if options.get("ensure_ascii"):
+            return None
+
+        try:
+            return self.orjson.dumps(o, default=options.get("default"), option=flags).decode()
+        except self.orjson.JSONEncodeError:
+            return None
+
+
+class UjsonBackend(Backend):
+    """Uses ujson, which works with strings."""
+
+    name = "ujson"
+    fast = True
+
+    def __init__(self):
+        """Fails with ImportError if ujson is not installed."""
+
+        import ujson
+        self.ujson = ujson
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self.ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def dumps(self, o: Any, options: Dict[str, Any]) -> Optional[str]:
+        for key, value in options.items():
+            if key not in ("default", "ensure_ascii", "indent", "sort_keys") and value not in (None, False):
+                return None
+        if options.get("ensure_ascii"):
+            return None
+
+        try:
+            return self.ujson.dumps(
+                o,
+                ensure_ascii=False,
+                escape_forward_slashes=False,
+                indent=options.get("indent") or 0,
+                sort_keys=bool(options.get("sort_keys")),
+                default=options.get("default"))
+        except (TypeError, OverflowError, ValueError):
+            return None
+
+
+# In order of preference
+BACKENDS = {
+    OrjsonBackend.name: OrjsonBackend,
+    UjsonBackend.name: UjsonBackend,
+    Backend.name: Backend}
+
+
+def use(name: str = None) -> Backend:
+    """Select a backend by name, or the fastest one installed.
+
+    The standard library is used until this is called, so output does
+    not depend on which optional packages happen to be installed.
+    """
+
+    global backend
+    if name is not None:
+        backend = BACKENDS[name]()
+        return backend
+
+    for constructor in BACKENDS.values():
+        try:
+            backend = constructor()
+        except ImportError:
+            continue
+        return backend
+
+
+backend: Backend = Backend()
+
+
+class TruncatingEncoder(json.JSONEncoder):
+    """Encoder that truncates strings as it writes them.
+
+    The input is never modified. Strings are truncated by the function
+    that quotes them, so the C accelerated encoder can still be used
+    when there is no indent. Note that keys are subject to the same
+    limit as values. Containers in the first few levels are encoded one
+    member at a time so that large reports are written out
+    incrementally.
+    """
+
+    def __init__(self, *, length: int = LIMIT, append: str = "...", **options):
+        """Same options as JSONEncoder plus the truncation length."""
+
+        super().__init__(**options)
+        self.length = length
+        self.append = append
+
+    def string_encoder(self) -> Callable[[str], str]:
+        """Quote a string, truncating it first if necessary."""
+
+        quote = json.encoder.encode_basestring_ascii if self.ensure_ascii else json.encoder.encode_basestring
+        if self.length <= 0:
+            return quote
+
+        length = self.length
+        append = self.append
+
+        def encode(string: str) -> str:
+            if len(string) > length:
+                string = string[:length - len(append)] + append
+            return quote(string)
+
+        return encode
+
+    def float_encoder(self) -> Callable[[float], str]:
+        """Same special cases as JSONEncoder."""
+
+        allow_nan = self.allow_nan
+
+        def encode(o: float) -> str:
+            if o != o:
+                text = "NaN"
+            elif o == json.encoder.INFINITY:
+                text = "Infinity"
+            elif o == -json.encoder.INFINITY:
+                text = "-Infinity"
+            else:
+                return float.__repr__(o)
+            if not allow_nan:
+                raise ValueError(f"Out of range float values are not JSON compliant: {o!r}")
+            return text
+
+        return encode
+
+    def iterencode(self, o: Any, _one_shot: bool = False) -> Iterator[str]:
+        """Yield the encoded object piece by piece."""
+
+        markers = {} if self.check_circular else None
+        encode_string = self.string_encoder()
+
+        if json.encoder.c_make_encoder is None or self.indent is not None:
+
+            # Newer versions expect the caller to convert the indent
+            indent = self.indent
+            if indent is not None and not isinstance(indent, str):
+                indent = " " * indent
+
+            return json.encoder._make_iterencode(
+                markers, self.default, encode_string, indent, self.float_encoder(),
+                self.key_separator, self.item_separator, self.sort_keys,
+                self.skipkeys, _one_shot)(o, 0)
+
+        encode = json.encoder.c_make_encoder(
+            markers, self.default, encode_string, self.indent,
+            self.key_separator, self.item_separator, self.sort_keys,
+            self.skipkeys, self.allow_nan)
+        if _one_shot:
+            return encode(o, 0)
+        return self._iterencode_streaming(o, encode, encode_string, STREAMING_DEPTH)
+
+    def _key(self, key: Any) -> Optional[str]:
+        """Convert a key like JSONEncoder, None if it is skipped."""
+
+        if isinstance(key, str):
+            return key
+        if isinstance(key, float):
+            return self.float_encoder()(key)
+        if key is True:
+            return "true"
+        if key is False:
+            return "false"
+        if key is None:
+            return "null"
+        if isinstance(key, int):
+            return int.__repr__(key)
+        if self.skipkeys:
+            return None
+        raise TypeError(f"keys must be str, int, float, bool or None, not {key.__class__.__name__}")
+
+    def _iterencode_streaming(
+            self,
+            o: Any,
+            encode: Callable[[Any, int], Iterable[str]],
+            encode_string: Callable[[str], str],
+            depth: int) -> Iterator[str]:
+        """Stream containers near the top, encoding the rest at once."""
+
+        if depth == 0 or not isinstance(o, (list, tuple, dict)) or not o:
+            yield from encode(o, 0)
+
+        elif isinstance(o, (list, tuple)):
+            yield "["
+            for i, item in enumerate(o):
+                if i:
+                    yield self.item_separator
+                yield from self._iterencode_streaming(item, encode, encode_string, depth - 1)
+            yield "]"
+
+        else:
+            items = sorted(o.items()) if self.sort_keys else o.items()
+            yield "{"
+            first = True
+            for key, value in items:
+                key = self._key(key)
+                if key is None:
+                    continue
+                if not first:
+                    yield self.item_separator
+                first = False
+                yield encode_string(key)
+                yield self.key_separator
+                yield from self._iterencode_streaming(value, encode, encode_string, depth - 1)
+            yield "}"
+
+
+def iterencode(o: Any, no_truncate: bool = False, **options) -> Iterator[str]:
+    """Encode an object incrementally without modifying it."""
+
+    if no_truncate:
+        options["length"] = 0
+    options.setdefault("default", default)
+    return TruncatingEncoder(**options).iterencode(o)
+
+
+def dumps(o: Any, no_truncate: bool = False, **options) -> Optional[str]:
+    """Encode with the fast backend if it supports the options."""
+
+    if not backend.fast:
+        return None
+    options.setdefault("default", default)
+    return backend.dumps(o if no_truncate else truncated(o, LIMIT), options)
+
+
 def dump(o: Any, file: TextIO, no_truncate: bool = False, **options):
-    """Write an object to a file."""
+    """Write an object to a file.
 
-    if not no_truncate:
-        descend_and_truncate(o, 100_000)
-    json.dump(o, file, **options)
+    Strings longer than LIMIT are truncated as they are written, and
+    the object itself is left untouched. Decimals, datetimes and paths
+    are written the same way the models serialize them.
+    """
+
+    encoded = dumps(o, no_truncate=no_truncate, **options)
+    if encoded is not None:
+        file.write(encoded)
+        return
+
+    for chunk in iterencode(o, no_truncate=no_truncate, **options):
+        file.write(chunk)
+
+
+def dump_lines(items: Iterable[Any], file: TextIO, no_truncate: bool = False, flush: bool = True, **options):
+    """Write objects as newline-delimited JSON.
+
+    Each item is written as a single line and the file is flushed
+    after it if flush is set, so results can be appended as they are
+    produced and read back with load_lines while still being written.
+    """
+
+    if options.get("indent") is not None:
+        raise ValueError("newline-delimited JSON cannot be indented")
+
+    options.setdefault("default", default)
+    encoder = TruncatingEncoder(length=0 if no_truncate else LIMIT, **options)
+    for item in items:
+        encoded = dumps(item, no_truncate=no_truncate, **options)
+        if encoded is None:
+            encoded = "".join(encoder.iterencode(item, _one_shot=True))
+        file.write(encoded)
+        file.write("\n")
+        if flush:
+            file.flush()
 
 
 def load(file: TextIO):
     """Read data from a file."""
 
-    return json.load(file)
+    return backend.loads(file.read())
+
+
+def load_lines(file: TextIO) -> Iterator[Any]:
+    """Read newline-delimited JSON, skipping blank lines."""
+
+    for line in file:
+        if line.strip():
+            yield backend.loads(line)
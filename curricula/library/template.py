@@ -1,16 +1,36 @@
+import os
 import jinja2
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from decimal import Decimal
+from fractions import Fraction
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..version import version
+from .cache import private_directory
 
 root = Path(__file__).absolute().parent
 log = logging.getLogger("curricula")
 
 
+def exact_decimal(d: Any) -> Decimal:
+    """Convert for display, rounding exact fractions only once."""
+
+    if isinstance(d, Decimal):
+        return d
+    if isinstance(d, Fraction):
+        return Decimal(d.numerator) / Decimal(d.denominator)
+    return Decimal(str(d))
+
+
 def pretty(decimal: Decimal) -> str:
     """Display a number nicely."""
 
+    if isinstance(decimal, Fraction):
+        decimal = exact_decimal(decimal)
     if int(decimal) == decimal:
         return str(int(decimal))
     return str(round(decimal, 3)).rstrip("0")
@@ -19,7 +39,7 @@ def pretty(decimal: Decimal) -> str:
 def percentage(d: Any, digits: int = 1) -> str:
     """Convert a float to a nice-looking percentage."""
 
-    converted = d if isinstance(d, Decimal) else Decimal(str(d))
+    converted = exact_decimal(d)
     converted *= 100
     if converted == converted.to_integral_value():
         return f"{int(converted)}%"
@@ -34,12 +54,91 @@ JINJA2_FILTERS = {
 }
 
 
+# Environments already created for a loader configuration
+ENVIRONMENTS: Dict[Tuple, jinja2.Environment] = {}
+
+# Bytecode caches by directory
+BYTECODE_CACHES: Dict[Path, Optional[jinja2.BytecodeCache]] = {}
+
+
+def default_bytecode_cache_path() -> Path:
+    """Per-user cache directory for compiled templates."""
+
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(root, "curricula", "jinja2")
+
+
+def jinja2_bytecode_cache(path: Path = None) -> Optional[jinja2.BytecodeCache]:
+    """Get a persistent cache of compiled templates.
+
+    Jinja2 invalidates entries whose template source checksum changed,
+    and the curricula version is part of each file name so upgrades
+    never load stale code. Since the cached code is executed, the
+    directory must be private to us. Returns None if it can't be
+    created or belongs to someone else, in which case templates are
+    compiled as usual.
+    """
+
+    if path is None:
+        path = default_bytecode_cache_path()
+    if path not in BYTECODE_CACHES:
+        BYTECODE_CACHES[path] = None
+        try:
+            if private_directory(path):
+                BYTECODE_CACHES[path] = jinja2.FileSystemBytecodeCache(
+                    str(path), pattern=f"__curricula_{version}_%s.cache")
+            else:
+                log.debug(f"not caching compiled templates in {path}, which is not ours")
+        except OSError as error:
+            log.debug(f"not caching compiled templates: {error}")
+    return BYTECODE_CACHES[path]
+
+
 def jinja2_create_environment(
         default_template_path: Path,
         custom_template_path: Path = None,
         assignment_path: Path = None,
-        problem_paths: Dict[str, Path] = None) -> jinja2.Environment:
-    """Configure a jinja2 environment."""
+        problem_paths: Dict[str, Path] = None,
+        cache: bool = True,
+        bytecode_cache_path: Path = None,
+        reuse: bool = False) -> jinja2.Environment:
+    """Configure a jinja2 environment.
+
+    With cache, compiled templates are persisted to disk and shared
+    across processes. With reuse, the same environment is returned for
+    the same template paths, which also keeps compiled templates in
+    memory, but is then shared with every other caller that asked for
+    reuse, so its globals and filters must not be modified.
+    """
+
+    key = (
+        default_template_path,
+        custom_template_path,
+        assignment_path,
+        tuple(sorted((problem_paths or {}).items())),
+        cache,
+        bytecode_cache_path)
+    if reuse and key in ENVIRONMENTS:
+        return ENVIRONMENTS[key]
+
+    environment = jinja2_build_environment(
+        default_template_path,
+        custom_template_path,
+        assignment_path,
+        problem_paths,
+        bytecode_cache=jinja2_bytecode_cache(bytecode_cache_path) if cache else None)
+    if reuse:
+        ENVIRONMENTS[key] = environment
+    return environment
+
+
+def jinja2_build_environment(
+        default_template_path: Path,
+        custom_template_path: Path = None,
+        assignment_path: Path = None,
+        problem_paths: Dict[str, Path] = None,
+        bytecode_cache: jinja2.BytecodeCache = None) -> jinja2.Environment:
+    """Create a new environment."""
 
     log.debug("creating jinja2 environment")
 
@@ -70,9 +169,107 @@ def jinja2_create_environment(
         autoescape=False,
         keep_trailing_newline=False,
         trim_blocks=True,
-        lstrip_blocks=True)
+        lstrip_blocks=True,
+        bytecode_cache=bytecode_cache)
 
     # Custom filters
     environment.filters.update(JINJA2_FILTERS)
 
     return environment
+
+
+@dataclass(eq=False)
+class TemplateConfiguration:
+    """Picklable arguments for jinja2_create_environment."""
+
+    default_template_path: Path
+    custom_template_path: Optional[Path] = None
+    assignment_path: Optional[Path] = None
+    problem_paths: Dict[str, Path] = field(default_factory=dict)
+    bytecode_cache_path: Optional[Path] = None
+
+    def environment(self) -> jinja2.Environment:
+        """Get the shared environment for this configuration.
+
+        Reused across renders, so it must not be modified.
+        """
+
+        return jinja2_create_environment(
+            self.default_template_path,
+            self.custom_template_path,
+            self.assignment_path,
+            self.problem_paths,
+            bytecode_cache_path=self.bytecode_cache_path,
+            reuse=True)
+
+
+# A template name and the context to render it with
+RenderJob = Tuple[str, Dict[str, Any]]
+
+
+def render(configuration: TemplateConfiguration, name: str, context: Dict[str, Any]) -> str:
+    """Render a single template, e.g. in a worker process."""
+
+    return configuration.environment().get_template(name).render(context)
+
+
+class Renderer:
+    """Render independent templates concurrently.
+
+    Templates are rendered in a pool of worker processes started from
+    a forkserver, each of which keeps its own environments and shares
+    compiled templates with the others through the bytecode cache on
+    disk. Results always come back in the order they were requested,
+    so output is the same regardless of scheduling. Contexts are
+    pickled to the workers, so they should be kept small. With one
+    worker, everything is rendered in this process.
+    """
+
+    def __init__(self, workers: int = None):
+        """Start the pool, by default with one worker per usable CPU."""
+
+        if workers is None:
+            workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        self.workers = workers
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"))
+
+    def render_many(self, configuration: TemplateConfiguration, jobs: Iterable[RenderJob]) -> List[str]:
+        """Render templates, returning output in the same order."""
+
+        jobs = list(jobs)
+        if self._executor is None or len(jobs) < 2:
+            return [render(configuration, name, context) for name, context in jobs]
+
+        futures = [self._executor.submit(render, configuration, name, context) for name, context in jobs]
+        return [future.result() for future in futures]
+
+    def render_assignment(
+            self,
+            configuration: TemplateConfiguration,
+            name: str,
+            problem_jobs: Iterable[RenderJob],
+            context: Dict[str, Any]) -> str:
+        """Render problems concurrently, then the assignment template.
+
+        The rendered problems are passed to the assignment template as
+        a list named problems, in the order of problem_jobs.
+        """
+
+        problems = self.render_many(configuration, problem_jobs)
+        return render(configuration, name, dict(context, problems=problems))
+
+    def close(self):
+        """Shut down the workers."""
+
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self) -> "Renderer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
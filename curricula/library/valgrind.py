@@ -1,5 +1,6 @@
 import os
-from xml.etree.ElementTree import Element, parse, ParseError
+import tempfile
+from xml.etree.ElementTree import Element, iterparse, ParseError
 from typing import Optional, List
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -7,7 +8,6 @@ from pathlib import Path
 from . import process
 
 VALGRIND_ARGS = ("valgrind", "--tool=memcheck", "--leak-check=yes", "--xml=yes")
-VALGRIND_XML_FILE = "valgrind.xml"
 
 
 @dataclass
@@ -93,26 +93,53 @@ class ValgrindReport:
             exception=self.exception)
 
 
+def parse_errors(path: Path) -> List[ValgrindError]:
+    """Incrementally parse errors, discarding elements once loaded."""
+
+    errors = []
+    root = None
+    depth = 0
+    for event, element in iterparse(str(path), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if element.tag == "error":
+                errors.append(ValgrindError.load(element))
+            root.clear()
+    return errors
+
+
 def run(*args: str, stdin: bytes = None, timeout: float = None, cwd: Path = None) -> ValgrindReport:
-    """Run valgrind on the program and return IR count."""
-
-    runtime = process.run(
-        *VALGRIND_ARGS,
-        f"--xml-file={VALGRIND_XML_FILE}",
-        *args,
-        stdin=stdin,
-        timeout=timeout,
-        cwd=cwd)
-    if os.path.exists(VALGRIND_XML_FILE):
-        errors = []
-        with open(VALGRIND_XML_FILE) as file:
-            try:
-                root = parse(file).getroot()
-            except ParseError:
-                return ValgrindReport(runtime, exception="cannot parse valgrind xml")
-            for child in root:
-                if child.tag == "error":
-                    errors.append(ValgrindError.load(child))
-        os.remove(VALGRIND_XML_FILE)
+    """Run valgrind on the program and return IR count.
+
+    Each invocation writes to its own temporary XML file, so multiple
+    runs may safely happen at the same time.
+    """
+
+    descriptor, name = tempfile.mkstemp(prefix="curricula-", suffix=".valgrind.xml")
+    os.close(descriptor)
+    xml_path = Path(name)
+
+    try:
+        runtime = process.run(
+            *VALGRIND_ARGS,
+            f"--xml-file={xml_path}",
+            *args,
+            stdin=stdin,
+            timeout=timeout,
+            cwd=cwd)
+        if xml_path.stat().st_size == 0:
+            return ValgrindReport(runtime=runtime, exception="valgrind did not write to output")
+        try:
+            errors = parse_errors(xml_path)
+        except ParseError:
+            return ValgrindReport(runtime, exception="cannot parse valgrind xml")
         return ValgrindReport(runtime=runtime, errors=errors)
-    return ValgrindReport(runtime=runtime, exception="valgrind did not write to output")
+
+    finally:
+        xml_path.unlink(missing_ok=True)
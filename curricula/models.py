@@ -1,16 +1,46 @@
-import time
 import datetime
 
 from decimal import Decimal
 from pathlib import Path
-from dataclasses import dataclass, asdict, field
-from typing import Optional, List, Callable, TypeVar
-from abc import ABC, abstractmethod
-from functools import lru_cache
+from dataclasses import dataclass, asdict, field, fields
+from typing import Optional, List, Callable, TypeVar, Iterable
+from abc import ABC
+from functools import wraps, lru_cache
 
 from .version import version
+from .library.schema import Schema, convert
+from .library import cache as library_cache, serialization
 
-TZ = datetime.timezone(offset=datetime.timedelta(seconds=time.timezone))
+
+@lru_cache(maxsize=None)
+def local_timezone(hour: str) -> datetime.tzinfo:
+    """Local UTC offset during an hour, e.g. 2021-03-14 02.
+
+    Offsets only change on the hour, so they are computed once per
+    hour with astimezone, which follows the system zone's DST rules.
+    """
+
+    return datetime.datetime.fromisoformat(f"{hour}:00").astimezone().tzinfo
+
+
+def parse_datetime(s: str) -> datetime.datetime:
+    """Parse our standard format as local time."""
+
+    if len(s) == 19 and s[10] == " ":
+        try:
+            return datetime.datetime.fromisoformat(s).replace(tzinfo=local_timezone(s[:13]))
+        except ValueError:
+            pass
+
+    # Whatever else strptime tolerates, e.g. unpadded fields
+    parsed = datetime.datetime.strptime(s, serialization.DATETIME_FORMAT)
+    return parsed.replace(tzinfo=local_timezone(parsed.strftime("%Y-%m-%d %H")))
+
+
+def now() -> datetime.datetime:
+    """Current local time, aware like deserialized datetimes."""
+
+    return datetime.datetime.now().astimezone()
 
 
 def deserialize_datetime(s: str) -> Optional[datetime.datetime]:
@@ -18,7 +48,7 @@ def deserialize_datetime(s: str) -> Optional[datetime.datetime]:
 
     if s is None:
         return None
-    return datetime.datetime.strptime(s, "%Y-%m-%d %H:%M:%S").replace(tzinfo=TZ)
+    return parse_datetime(s)
 
 
 def serialize_datetime(d: datetime) -> Optional[str]:
@@ -26,7 +56,7 @@ def serialize_datetime(d: datetime) -> Optional[str]:
 
     if d is None:
         return None
-    return d.strftime("%Y-%m-%d %H:%M:%S")
+    return d.replace(tzinfo=None).isoformat(" ", "seconds")
 
 
 T = TypeVar("T")
@@ -41,19 +71,131 @@ def some(value: Optional[T], method: Callable[[T], U]) -> Optional[U]:
     return method(value)
 
 
+def slotted(cls: type) -> type:
+    """Rebuild a dataclass with __slots__ for its fields.
+
+    Equivalent to dataclass(slots=True), which is not available in
+    Python 3.9. Instances no longer carry a __dict__, which matters
+    when loading many assignments at once. Classes rebuilt this way
+    must not use zero-argument super().
+    """
+
+    inherited = {name for base in cls.__mro__[1:] for name in getattr(base, "__slots__", ())}
+    names = tuple(f.name for f in fields(cls) if f.name not in inherited)
+
+    namespace = dict(cls.__dict__)
+    for name in names:
+        namespace.pop(name, None)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    namespace["__slots__"] = names
+
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+INITIALIZING = object()
+
+
+def memoized(method: Callable[["Model"], T]) -> Callable[["Model"], T]:
+    """Cache a derived value on the instance until it is invalidated.
+
+    May be stacked under property. Values are dropped whenever a field
+    of the model, or of a model it depends on, is assigned.
+    """
+
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self: "Model") -> T:
+        memo = self._memo
+        if memo is None or memo is INITIALIZING:
+            memo = {}
+            object.__setattr__(self, "_memo", memo)
+        if name not in memo:
+            memo[name] = method(self)
+        return memo[name]
+
+    return wrapper
+
+
 @dataclass(eq=False)
 class Model(ABC):
     """Provide some default behaviors."""
 
+    __slots__ = ("_memo",)
+
+    def __new__(cls, *args, **kwargs):
+        """Mark the instance as under construction."""
+
+        self = object.__new__(cls)
+        object.__setattr__(self, "_memo", INITIALIZING)
+        return self
+
+    def __post_init__(self):
+        """Start tracking changes once every field is set."""
+
+        object.__setattr__(self, "_memo", None)
+
+    def __setattr__(self, key, value):
+        """Drop memoized values when anything changes after init."""
+
+        object.__setattr__(self, key, value)
+        if self._memo is not INITIALIZING:
+            self.invalidate()
+
+    def dependents(self) -> Iterable["Model"]:
+        """Models whose memoized values are derived from this one."""
+
+        return ()
+
+    def invalidate(self):
+        """Clear memoized values here and in anything derived from us.
+
+        Called automatically on assignment, but must be called manually
+        after mutating a container in place, e.g. assignment.problems.
+        """
+
+        pending = [self]
+        seen = set()
+        while pending:
+            model = pending.pop()
+            if model is None or model._memo is INITIALIZING or id(model) in seen:
+                continue
+
+            # Dependencies may be mutual, e.g. an assignment and its grading
+            seen.add(id(model))
+            object.__setattr__(model, "_memo", None)
+            pending.extend(model.dependents())
+
     def dump(self) -> dict:
+        """Serialize to JSON-compatible data.
+
+        Subclasses memoize their dumps and build them from the dumps of
+        the models they contain, so unchanged parts are shared between
+        calls. The result must therefore be treated as read-only.
+        """
+
         return asdict(self)
 
     @classmethod
-    @abstractmethod
     def load(cls, data: dict) -> "Model":
-        """Load the model from serialized data."""
+        """Load the model from serialized data.
+
+        Decoding is done by a function compiled once per model, which
+        raises SchemaError with the path of any invalid field and never
+        modifies the data it is given.
+        """
+
+        return schema.load(cls, data)
+
+    @classmethod
+    def load_many(cls, items: Iterable[dict]) -> List["Model"]:
+        """Load a list of models, e.g. a whole catalog."""
+
+        return schema.load_many(cls, items)
 
 
+@slotted
 @dataclass(eq=False)
 class Author(Model):
     """Name and email."""
@@ -61,13 +203,20 @@ class Author(Model):
     name: str
     email: str
 
-    @classmethod
-    def load(cls, data: dict) -> "Author":
-        """Deserialize and check for errors."""
+    # Backlink to the problem or assignment that lists us
+    owner: Optional[Model] = field(default=None, repr=False, metadata=dict(load=False))
 
-        return Author(name=data.pop("name"), email=data.pop("email"))
+    def dependents(self) -> Iterable[Model]:
+        return self.owner,
 
+    @memoized
+    def dump(self) -> dict:
+        """Leave out the backlink."""
 
+        return dict(name=self.name, email=self.email)
+
+
+@slotted
 @dataclass(eq=False)
 class ProblemGradingCategory(Model):
     """Data about weight, points, etc."""
@@ -82,17 +231,13 @@ class ProblemGradingCategory(Model):
     name: Optional[str] = None
     minutes: Optional[float] = None
 
-    @classmethod
-    def load(cls, data: dict) -> "ProblemGradingCategory":
-        """Deserialize decimals."""
+    # Backlink
+    grading: "ProblemGrading" = field(default=None, repr=False, metadata=dict(load=False))
 
-        return cls(
-            enabled=data.get("enabled", True),
-            name=data["name"],
-            minutes=data.get("minutes"),
-            weight=Decimal(data["weight"]),
-            points=Decimal(data["points"]),)
+    def dependents(self) -> Iterable[Model]:
+        return self.grading,
 
+    @memoized
     def dump(self) -> dict:
         """Use string format."""
 
@@ -104,6 +249,7 @@ class ProblemGradingCategory(Model):
             points=str(self.points),)
 
 
+@slotted
 @dataclass(eq=False)
 class ProblemGrading(Model):
     """Data for each grading method."""
@@ -117,6 +263,19 @@ class ProblemGrading(Model):
     review: Optional[ProblemGradingCategory] = None
     manual: Optional[ProblemGradingCategory] = None
 
+    # Backlink
+    problem: "Problem" = field(default=None, repr=False, metadata=dict(load=False))
+
+    def __setattr__(self, key, value):
+        """Link categories back to us."""
+
+        Model.__setattr__(self, key, value)
+        if key in ("automated", "review", "manual") and value is not None:
+            value.grading = self
+
+    def dependents(self) -> Iterable[Model]:
+        return self.problem,
+
     @property
     def is_automated(self) -> bool:
         return self.enabled and self.automated is not None and self.automated.enabled
@@ -130,7 +289,7 @@ class ProblemGrading(Model):
         return self.enabled and self.manual is not None and self.manual.enabled
 
     @property
-    @lru_cache(maxsize=1)
+    @memoized
     def weight_total(self) -> Decimal:
         return sum((
             self.automated.weight if self.automated and self.automated.enabled else 0,
@@ -138,36 +297,33 @@ class ProblemGrading(Model):
             self.manual.weight if self.manual and self.manual.enabled else 0))
 
     @property
+    @memoized
     def percentage_automated(self) -> Decimal:
         return self.automated.weight / self.weight_total
 
     @property
+    @memoized
     def percentage_review(self) -> Decimal:
         return self.review.weight / self.weight_total
 
     @property
+    @memoized
     def percentage_manual(self) -> Decimal:
         return self.manual.weight / self.weight_total
 
-    @classmethod
-    def load(cls, data: dict) -> "ProblemGrading":
-        """Deserialize each method."""
-
-        if data["automated"] is not None and data["automated"].get("name") is None:
-            data["automated"]["name"] = "Automated tests"
-        if data["review"] is not None and data["review"].get("name") is None:
-            data["review"]["name"] = "Code review"
-        if data["manual"] is not None and data["manual"].get("name") is None:
-            data["manual"]["name"] = "Manual grading"
-
-        return cls(
-            enabled=data.get("enabled", True),
-            weight=Decimal(data["weight"]),
-            points=Decimal(data["points"]),
-            automated=some(data["automated"], ProblemGradingCategory.load),
-            review=some(data["review"], ProblemGradingCategory.load),
-            manual=some(data["manual"], ProblemGradingCategory.load),)
+    def loaded(self):
+        """Link categories and fill in default names."""
+
+        for category, name in (
+                (self.automated, "Automated tests"),
+                (self.review, "Code review"),
+                (self.manual, "Manual grading")):
+            if category is not None:
+                object.__setattr__(category, "grading", self)
+                if category.name is None:
+                    object.__setattr__(category, "name", name)
 
+    @memoized
     def dump(self) -> dict:
         """Serialize with monad."""
 
@@ -180,6 +336,7 @@ class ProblemGrading(Model):
             manual=some(self.manual, ProblemGradingCategory.dump),)
 
 
+@slotted
 @dataclass(eq=False)
 class Problem(Model):
     """All problem data."""
@@ -201,25 +358,35 @@ class Problem(Model):
     difficulty: Optional[str] = None
 
     # Backlink
-    assignment: "Assignment" = None
+    assignment: "Assignment" = field(default=None, repr=False, metadata=dict(load=False))
+
+    def dependents(self) -> Iterable[Model]:
+        return self.assignment,
 
     @classmethod
     def load(cls, data: dict, assignment: "Assignment" = None) -> "Problem":
         """Load directly from a dictionary."""
 
-        self = cls(
-            assignment=assignment,
-            short=data["short"],
-            title=data["title"],
-            relative_path=Path(data["relative_path"]),
-            grading=ProblemGrading.load(data["grading"]),
-            authors=list(map(Author.load, data["authors"])),
-            topics=data["topics"],
-            notes=data.get("notes"),
-            difficulty=data.get("difficulty"))
-        self.grading.problem = self
+        self = schema.load(cls, data)
+        if assignment is not None:
+            self.assignment = assignment
         return self
 
+    def __setattr__(self, key, value):
+        """Relink replaced children."""
+
+        Model.__setattr__(self, key, value)
+        if key in ("grading", "authors") and self._memo is not INITIALIZING:
+            self.loaded()
+
+    def loaded(self):
+        """Link grading and authors back to us."""
+
+        object.__setattr__(self.grading, "problem", self)
+        for author in self.authors:
+            object.__setattr__(author, "owner", self)
+
+    @memoized
     def dump(self) -> dict:
         """Serialize 1:1."""
 
@@ -228,52 +395,60 @@ class Problem(Model):
             title=self.title,
             relative_path=str(self.relative_path),
             grading=self.grading.dump(),
-            authors=list(map(Author.dump, self.authors)),
+            authors=[author.dump() for author in self.authors],
             topics=self.topics,
             notes=self.notes,
             difficulty=self.difficulty,)
 
 
+@slotted
 @dataclass(eq=False)
 class AssignmentGrading(Model):
     """Weights and points."""
 
     points: int
-    assignment: "Assignment" = field(default=None)
+    assignment: "Assignment" = field(default=None, repr=False, metadata=dict(load=False))
+
+    def dependents(self) -> Iterable[Model]:
+        return self.assignment,
 
     @classmethod
     def load(cls, data: dict, assignment: "Assignment" = None) -> "AssignmentGrading":
         """Load from serialized."""
 
-        return cls(points=data["points"], assignment=assignment)
+        self = schema.load(cls, data)
+        if assignment is not None:
+            self.assignment = assignment
+        return self
 
-    @lru_cache(maxsize=1)
+    @memoized
     def weight(self) -> Decimal:
         """Compute cumulative weight of all problems."""
 
         return sum(problem.grading.weight for problem in self.assignment.problems)
 
+    @memoized
     def dump(self) -> dict:
         """Avoid recursion."""
 
         return dict(points=self.points)
 
 
+@slotted
 @dataclass(eq=False)
 class AssignmentMeta(Model):
     """Metadata about an assignment."""
 
-    built: datetime.datetime = field(default_factory=datetime.datetime.now)
+    built: datetime.datetime = field(default_factory=now)
     curricula: str = version
 
-    @classmethod
-    def load(cls, data: dict) -> "AssignmentMeta":
-        """Deserialize datetime."""
+    # Backlink
+    assignment: "Assignment" = field(default=None, repr=False, metadata=dict(load=False))
 
-        return cls(
-            built=deserialize_datetime(data["built"]),
-            curricula=data["curricula"],)
+    def dependents(self) -> Iterable[Model]:
+        return self.assignment,
 
+    @memoized
     def dump(self) -> dict:
         """Serialize the datetime here too."""
 
@@ -282,6 +457,7 @@ class AssignmentMeta(Model):
             curricula=version,)
 
 
+@slotted
 @dataclass(eq=False)
 class AssignmentDates(Model):
     """Assignment dates."""
@@ -290,15 +466,13 @@ class AssignmentDates(Model):
     due: Optional[datetime.datetime]
     deadline: Optional[datetime.datetime]
 
-    @classmethod
-    def load(cls, data: dict) -> "AssignmentDates":
-        """Convert to datetime."""
+    # Backlink
+    assignment: "Assignment" = field(default=None, repr=False, metadata=dict(load=False))
 
-        return cls(
-            assigned=deserialize_datetime(data["assigned"]),
-            due=deserialize_datetime(data.get("due")),
-            deadline=deserialize_datetime(data.get("deadline")))
+    def dependents(self) -> Iterable[Model]:
+        return self.assignment,
 
+    @memoized
     def dump(self) -> dict:
         """Specifically serialize the datetime."""
 
@@ -308,6 +482,7 @@ class AssignmentDates(Model):
             deadline=serialize_datetime(self.deadline))
 
 
+@slotted
 @dataclass(eq=False)
 class Assignment(Model):
     """Contains assignment metadata."""
@@ -322,33 +497,56 @@ class Assignment(Model):
     dates: Optional[AssignmentDates] = None
 
     notes: Optional[str] = None
-    meta: AssignmentMeta = AssignmentMeta()
+    meta: AssignmentMeta = field(default_factory=AssignmentMeta)
     extra: Optional[dict] = None
 
+    def dependents(self) -> Iterable[Model]:
+        return self.grading,
+
     @classmethod
     def load(cls, data: dict, problems: List[Problem] = None) -> "Assignment":
-        """Deserialize."""
-
-        if problems is None:
-            problems = list(map(Problem.load, data["problems"]))
-
-        self = cls(
-            short=data["short"],
-            title=data["title"],
-            authors=list(map(Author.load, data["authors"])),
-            problems=problems,
-            grading=AssignmentGrading.load(data["grading"]),
-            dates=AssignmentDates.load(data["dates"]),
-            extra=data.get("extra"),
-            notes=data.get("notes"),
-            meta=AssignmentMeta.load(data["meta"]) if "meta" in data else AssignmentMeta())
-
-        for problem in problems:
-            problem.assignment = self
-        self.grading.assignment = self
+        """Deserialize, optionally with problems that are already loaded."""
 
+        if problems is not None:
+            data = dict(data, problems=[])
+        self = schema.load(cls, data)
+        if problems is not None:
+            self.problems = problems
         return self
 
+    @classmethod
+    def read(cls, path: Path, cache: bool = False) -> "Assignment":
+        """Read an assignment or index JSON file.
+
+        If cache is set, a binary cache of the parsed file is kept in
+        the per-user cache directory and used whenever it is fresh.
+        """
+
+        if cache:
+            return library_cache.load(path, cls.load)
+        with path.open() as file:
+            return cls.load(serialization.load(file))
+
+    def __setattr__(self, key, value):
+        """Relink replaced children."""
+
+        Model.__setattr__(self, key, value)
+        if key in ("authors", "problems", "grading", "dates", "meta") and self._memo is not INITIALIZING:
+            self.loaded()
+
+    def loaded(self):
+        """Link authors, problems, grading, dates and meta back to us."""
+
+        for author in self.authors:
+            object.__setattr__(author, "owner", self)
+        for problem in self.problems:
+            object.__setattr__(problem, "assignment", self)
+        object.__setattr__(self.grading, "assignment", self)
+        if self.dates is not None:
+            object.__setattr__(self.dates, "assignment", self)
+        object.__setattr__(self.meta, "assignment", self)
+
+    @memoized
     def dump(self) -> dict:
         """Dump the assignment to JSON."""
 
@@ -362,3 +560,8 @@ class Assignment(Model):
             extra=self.extra,
             notes=self.notes,
             meta=self.meta.dump())
+
+
+schema = Schema({
+    Path: convert(Path, str, "path"),
+    datetime.datetime: convert(deserialize_datetime, str, "datetime")})
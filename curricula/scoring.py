@@ -0,0 +1,143 @@
+import operator
+from dataclasses import dataclass
+from decimal import Decimal
+from fractions import Fraction
+from math import lcm
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .models import Assignment
+
+__all__ = ("CATEGORIES", "Scorer", "to_decimal")
+
+CATEGORIES = ("automated", "review", "manual")
+
+# Problem short and category name
+Key = Tuple[str, str]
+
+Number = Union[int, str, Decimal, Fraction]
+
+
+def to_decimal(fraction: Fraction) -> Decimal:
+    """Round an exact value once in the current decimal context.
+
+    Decimal division is correctly rounded, so this is identical to
+    what a single Decimal division of the same operands would give.
+    """
+
+    return Decimal(fraction.numerator) / Decimal(fraction.denominator)
+
+
+@dataclass(eq=False)
+class Scorer:
+    """Exact, Decimal-free grade rollups for an assignment.
+
+    The share of the assignment held by each enabled category of each
+    problem is derived from the same weights the models use, as an
+    exact fraction. These are scaled to integer coefficients over a
+    common denominator, and earned points to integers with a fixed
+    number of decimal places, so that scoring a student is a single
+    integer dot product. Results are exact fractions, which can be
+    rounded with to_decimal.
+    """
+
+    keys: Tuple[Key, ...]
+    coefficients: Tuple[int, ...]
+    denominator: int
+    points: int
+
+    # Earned points are fixed-point with this many decimal places
+    places: int = 3
+
+    @classmethod
+    def from_assignment(cls, assignment: Assignment, places: int = 3) -> "Scorer":
+        """Precompute the coefficient of every scored category."""
+
+        total = sum((Fraction(problem.grading.weight) for problem in assignment.problems), Fraction(0))
+        if total == 0:
+            raise ZeroDivisionError(f"assignment {assignment.short} has no weight")
+
+        keys = []
+        shares = []
+        for problem in assignment.problems:
+            grading = problem.grading
+            if not grading.enabled:
+                continue
+            categories = [(name, getattr(grading, name)) for name in CATEGORIES]
+            categories = [(name, category) for name, category in categories if category is not None and category.enabled]
+            weight_total = sum((Fraction(category.weight) for _, category in categories), Fraction(0))
+            if weight_total == 0:
+                continue
+            for name, category in categories:
+                keys.append((problem.short, name))
+
+                # Nothing can be earned in a category worth no points
+                points = Fraction(category.points)
+                if points == 0:
+                    shares.append(Fraction(0))
+                    continue
+
+                shares.append(
+                    Fraction(grading.weight) / total
+                    * Fraction(category.weight) / weight_total
+                    / points)
+
+        scale = 10 ** places
+        denominator = lcm(*(share.denominator for share in shares)) * scale if shares else scale
+        coefficients = tuple(share.numerator * (denominator // scale // share.denominator) for share in shares)
+        return Scorer(
+            keys=tuple(keys),
+            coefficients=coefficients,
+            denominator=denominator,
+            points=assignment.grading.points,
+            places=places)
+
+    def fixed(self, value: Number) -> int:
+        """Convert earned points to an integer number of units."""
+
+        scale = 10 ** self.places
+        if type(value) is int:
+            return value * scale
+        if type(value) is str:
+            value = Decimal(value)
+        numerator, denominator = value.as_integer_ratio()
+        if scale % denominator:
+            raise ValueError(f"{value} has more than {self.places} decimal places")
+        return numerator * (scale // denominator)
+
+    def row(self, earned: Mapping[Key, Number]) -> List[int]:
+        """Convert earned points by key, missing keys scoring zero."""
+
+        return [self.fixed(earned.get(key, 0)) for key in self.keys]
+
+    def rows(self, earned: Iterable[Mapping[Key, Number]]) -> List[List[int]]:
+        """Convert the earned points of many students."""
+
+        return [self.row(item) for item in earned]
+
+    def score(self, row: Sequence[int]) -> Fraction:
+        """Exact fraction of the assignment earned, from a converted row."""
+
+        return Fraction(sum(map(operator.mul, self.coefficients, row)), self.denominator)
+
+    def score_many(self, rows: Iterable[Sequence[int]]) -> List[Fraction]:
+        """Score many converted rows with the same coefficients."""
+
+        coefficients = self.coefficients
+        denominator = self.denominator
+        return [Fraction(sum(map(operator.mul, coefficients, row)), denominator) for row in rows]
+
+    def grade(self, row: Sequence[int]) -> Fraction:
+        """Exact points earned out of the assignment's points."""
+
+        return self.score(row) * self.points
+
+    def shares(self) -> Dict[Key, Fraction]:
+        """Exact share of the assignment held by each point."""
+
+        return {key: Fraction(coefficient * 10 ** self.places, self.denominator)
+                for key, coefficient in zip(self.keys, self.coefficients)}
+
+    def share(self, key: Key) -> Optional[Fraction]:
+        """Share of the assignment held by one point of a category."""
+
+        return self.shares().get(key)
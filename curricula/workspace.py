@@ -0,0 +1,195 @@
+import os
+import stat
+import shutil
+from pathlib import Path
+from typing import Union
+
+from .library import files
+from .structure import Artifacts
+
+__all__ = ("Snapshot", "Workspace", "Workspaces")
+
+WRITE = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def set_writable(path: Path, writable: bool):
+    """Add or remove write permission on everything in a tree."""
+
+    for directory, names, filenames in os.walk(str(path)):
+        for name in filenames:
+            file = os.path.join(directory, name)
+            mode = os.stat(file, follow_symlinks=False).st_mode
+            if not stat.S_ISLNK(mode):
+                os.chmod(file, (mode | stat.S_IWUSR) if writable else (mode & ~WRITE))
+        mode = os.stat(directory).st_mode
+        os.chmod(directory, (mode | stat.S_IWUSR) if writable else (mode & ~WRITE))
+
+
+class Snapshot:
+    """A read-only copy of an artifact shared by many workspaces.
+
+    Updating only copies what changed since the last update, and the
+    copy is read-only so that workspaces can't modify it by accident.
+    """
+
+    source: Path
+    path: Path
+
+    def __init__(self, source: Path, path: Path):
+        """Paths are made absolute since workspaces link into them."""
+
+        self.source = source.absolute()
+        self.path = path.absolute()
+
+    def update(self, workers: int = 1) -> files.SyncResult:
+        """Bring the snapshot up to date with the artifact."""
+
+        if self.path.exists():
+            set_writable(self.path, True)
+        try:
+            return files.sync_directory(self.source, self.path, workers=workers)
+        finally:
+            set_writable(self.path, False)
+
+
+class Workspace:
+    """A working directory layered over a snapshot.
+
+    In symlink mode, each top level entry of the snapshot is linked
+    into the workspace, so staging takes the same time no matter how
+    large the snapshot is. In hardlink mode, every file is linked,
+    which costs more but keeps paths real. Submitted files are copied
+    on top. Anything a test writes to must first be made private with
+    writable, which copies it and, in symlink mode, replaces the
+    linked directories above it with real ones.
+    """
+
+    snapshot: Snapshot
+    path: Path
+    mode: str
+
+    def __init__(self, snapshot: Snapshot, path: Path, mode: str = "symlink"):
+        if mode not in ("symlink", "hardlink"):
+            raise ValueError(f"unknown workspace mode {mode}")
+        self.snapshot = snapshot
+        self.path = path
+        self.mode = mode
+
+    def stage(self, submission: Path = None):
+        """Recreate the workspace with an optional submission on top."""
+
+        self.cleanup()
+        self.path.mkdir(parents=True)
+        if self.mode == "hardlink":
+            files.sync_directory(self.snapshot.path, self.path, link=True, copy_modes=False)
+        else:
+            self.link_children(self.snapshot.path, self.path)
+
+        if submission is not None:
+            self.overlay(submission, Path())
+
+    @staticmethod
+    def link_children(source: Path, destination: Path):
+        """Symlink everything in a snapshot directory."""
+
+        with os.scandir(str(source)) as entries:
+            for entry in entries:
+                os.symlink(entry.path, os.path.join(str(destination), entry.name))
+
+    def overlay(self, source: Path, relative: Path):
+        """Copy submitted files over the snapshot."""
+
+        with os.scandir(str(source)) as entries:
+            for entry in entries:
+                path = relative.joinpath(entry.name)
+                target = self.path.joinpath(path)
+                if entry.is_dir():
+                    if target.exists() and target.is_dir():
+                        self.writable(path)
+                        self.overlay(Path(entry.path), path)
+                    else:
+                        self.remove(target)
+                        files.sync_directory(Path(entry.path), target)
+                else:
+                    self.remove(target)
+                    files.copy_file(Path(entry.path), target)
+
+    @staticmethod
+    def remove(path: Path):
+        """Remove a link, file or copied directory if present."""
+
+        if path.is_symlink() or path.is_file():
+            path.unlink()
+        elif path.is_dir():
+            files.delete_directory(path)
+
+    def writable(self, relative: Union[Path, str]) -> Path:
+        """Make a file or directory private to this workspace.
+
+        Returns its path in the workspace. The path doesn't have to
+        exist yet, in which case only its parents are made writable.
+        """
+
+        current = self.path
+        for part in Path(relative).parts:
+            current = current.joinpath(part)
+            if current.is_symlink():
+                target = current.parent.joinpath(os.readlink(str(current)))
+                current.unlink()
+                if target.is_dir():
+                    current.mkdir()
+                    self.link_children(target, current)
+                else:
+                    files.copy_file(target, current)
+                    files.add_mode(current, stat.S_IWUSR)
+            elif current.is_dir():
+                files.add_mode(current, stat.S_IWUSR)
+            elif current.is_file() and os.stat(str(current)).st_nlink > 1:
+                target = current.with_name(f".{current.name}.copy")
+                shutil.copy2(str(current), str(target))
+                os.replace(str(target), str(current))
+                files.add_mode(current, stat.S_IWUSR)
+        return current
+
+    def cleanup(self):
+        """Delete the workspace, leaving the snapshot alone."""
+
+        if self.path.exists():
+            for directory, names, filenames in os.walk(str(self.path)):
+                files.add_mode(Path(directory), stat.S_IWUSR)
+            files.delete_directory(self.path)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+
+class Workspaces:
+    """Stage per-submission workspaces for a built assignment.
+
+    The grading artifact is snapshotted once, and each submission gets
+    a workspace layered over it along with the submitted files.
+    """
+
+    snapshot: Snapshot
+    root: Path
+    mode: str
+
+    def __init__(self, artifacts: Artifacts, root: Path, mode: str = "symlink"):
+        self.snapshot = Snapshot(artifacts.grading.path, root.joinpath("base"))
+        self.root = root
+        self.mode = mode
+
+    def update(self, workers: int = 1) -> files.SyncResult:
+        """Refresh the snapshot after the artifacts are rebuilt."""
+
+        return self.snapshot.update(workers=workers)
+
+    def stage(self, name: str, submission: Path = None) -> Workspace:
+        """Create a fresh workspace for a submission."""
+
+        workspace = Workspace(self.snapshot, self.root.joinpath("workspaces", name), mode=self.mode)
+        workspace.stage(submission)
+        return workspace
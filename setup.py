@@ -28,6 +28,9 @@ setup(
     # Python
     python_requires=">=3.9",
 
+    # Optional faster JSON backend, enabled with serialization.use()
+    extras_require={"fast": ["orjson"]},
+
     # Packaging
     packages=find_packages(),
     zip_safe=False)
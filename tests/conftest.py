@@ -0,0 +1,34 @@
+import pytest
+
+from curricula.models import Assignment
+
+
+def category(weight: str, points: str, enabled: bool = True) -> dict:
+    return dict(weight=weight, points=points, enabled=enabled)
+
+
+def problem(short: str, weight: str, automated: dict = None, review: dict = None, manual: dict = None) -> dict:
+    return dict(
+        short=short,
+        title=short.upper(),
+        relative_path=short,
+        grading=dict(weight=weight, points="10", automated=automated, review=review, manual=manual),
+        authors=[dict(name="Author", email="author@example.com")],
+        topics=[],)
+
+
+@pytest.fixture
+def assignment() -> Assignment:
+    """A small assignment with uneven weights and a disabled category."""
+
+    return Assignment.load(dict(
+        short="hw1",
+        title="Homework 1",
+        authors=[dict(name="Author", email="author@example.com")],
+        grading=dict(points=100),
+        dates=dict(assigned="2020-01-01 00:00:00", due="2020-01-08 00:00:00", deadline=None),
+        problems=[
+            problem("p1", "1", automated=category("1", "10"), review=category("2", "7.5")),
+            problem("p2", "3", automated=category("3", "3"), manual=category("7", "10")),
+            problem("p3", "1.25", automated=category("1", "12"), review=category("2", "5", enabled=False)),
+        ]))
@@ -0,0 +1,31 @@
+from curricula.library import callgrind
+
+OUTPUT = """\
+version: 1
+creator: callgrind-3.19.0
+positions: line
+events: Ir
+summary: 150
+
+fl=(1) main.c
+fn=(1) main
+1 10
+cfl=(1)
+cfn=(2) helper
+calls=3 5
+2 100
+3 5
+
+fn=(2)
+5 100
+"""
+
+
+def test_parse():
+    report = callgrind.parse(OUTPUT.splitlines(keepends=True))
+    assert report.total == 150
+
+    main = report.function("main")
+    assert (main.exclusive, main.inclusive, main.calls) == (15, 115, 0)
+    helper = report.function("helper")
+    assert (helper.exclusive, helper.inclusive, helper.calls) == (100, 100, 3)
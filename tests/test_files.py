@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from curricula.library import files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path.joinpath("real")
+    root.joinpath("sub").mkdir(parents=True)
+    root.joinpath("a.txt").write_text("a")
+    root.joinpath("sub", "b.txt").write_text("b")
+    return root
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_delete_directory(tree, workers):
+    files.delete_directory(tree, workers=workers)
+    assert not tree.exists()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_delete_directory_refuses_symlink(tree, workers):
+    link = tree.parent.joinpath("link")
+    link.symlink_to(tree)
+    with pytest.raises(OSError):
+        files.delete_directory(link, workers=workers)
+    with pytest.raises(OSError):
+        files.replace_directory(link, workers=workers)
+    assert sorted(os.listdir(tree)) == ["a.txt", "sub"]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_sync_directory(tree, tmp_path, workers):
+    destination = tmp_path.joinpath("copy")
+    result = files.sync_directory(tree, destination, workers=workers)
+    assert result.copied == 2
+    assert destination.joinpath("sub", "b.txt").read_text() == "b"
+
+    tree.joinpath("a.txt").unlink()
+    result = files.sync_directory(tree, destination, workers=workers)
+    assert result.removed == 1
+    assert not destination.joinpath("a.txt").exists()
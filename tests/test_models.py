@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from curricula.models import Author, ProblemGradingCategory
+
+
+def test_memoized_values_are_reused(assignment):
+    grading = assignment.problems[0].grading
+    assert grading.weight_total == Decimal(3)
+    assert grading._memo["weight_total"] == Decimal(3)
+
+    # Served from the memo rather than recomputed
+    grading._memo["weight_total"] = Decimal(30)
+    assert grading.weight_total == Decimal(30)
+    assert assignment.dump() is assignment.dump()
+    assert assignment.grading.weight() is assignment.grading.weight()
+
+
+def test_category_weight_invalidates_chain(assignment):
+    grading = assignment.problems[0].grading
+    assert grading.weight_total == Decimal(3)
+    assert grading.percentage_automated == Decimal(1) / Decimal(3)
+    assert assignment.grading.weight() == Decimal("5.25")
+    before = assignment.dump()
+
+    grading.automated.weight = Decimal(2)
+    assert grading.weight_total == Decimal(4)
+    assert grading.percentage_automated == Decimal("0.5")
+    assert grading.percentage_review == Decimal("0.5")
+
+    after = assignment.dump()
+    assert after is not before
+    assert after["problems"][0]["grading"]["automated"]["weight"] == "2"
+    assert before["problems"][0]["grading"]["automated"]["weight"] == "1"
+
+    # Unchanged problems are shared between dumps
+    assert after["problems"][1] is before["problems"][1]
+
+
+def test_problem_weight_invalidates_assignment_grading(assignment):
+    assert assignment.grading.weight() == Decimal("5.25")
+    assignment.problems[1].grading.weight = Decimal(1)
+    assert assignment.grading.weight() == Decimal("3.25")
+    assert assignment.dump()["problems"][1]["grading"]["weight"] == "1"
+
+
+def test_replaced_category_is_linked(assignment):
+    grading = assignment.problems[0].grading
+    assert grading.weight_total == Decimal(3)
+    grading.review = ProblemGradingCategory(weight=Decimal(5), points=Decimal(10))
+    assert grading.weight_total == Decimal(6)
+    assert grading.percentage_review == Decimal(5) / Decimal(6)
+
+    # The new category invalidates through its backlink
+    grading.review.weight = Decimal(1)
+    assert grading.weight_total == Decimal(2)
+    assert assignment.dump()["problems"][0]["grading"]["review"]["weight"] == "1"
+
+
+def test_disabling_category_invalidates(assignment):
+    grading = assignment.problems[1].grading
+    assert grading.percentage_automated == Decimal("0.3")
+    grading.manual.enabled = False
+    assert grading.weight_total == Decimal(3)
+    assert grading.percentage_automated == Decimal(1)
+
+
+def test_assignment_edits_invalidate_dump(assignment):
+    assert assignment.dump()["grading"] == dict(points=100)
+    assignment.grading.points = 50
+    assert assignment.dump()["grading"] == dict(points=50)
+
+    assignment.authors[0].name = "Someone"
+    assert assignment.dump()["authors"][0]["name"] == "Someone"
+    assignment.authors = [Author(name="Other", email="other@example.com")]
+    assert assignment.dump()["authors"][0]["name"] == "Other"
+    assignment.authors[0].email = "changed@example.com"
+    assert assignment.dump()["authors"][0]["email"] == "changed@example.com"
+
+
+def test_container_mutation_needs_invalidate(assignment):
+    assert assignment.grading.weight() == Decimal("5.25")
+    del assignment.problems[2]
+    assignment.invalidate()
+    assert assignment.grading.weight() == Decimal(4)
+    assert len(assignment.dump()["problems"]) == 2
+
+
+def test_repr_leaves_out_backlinks(assignment):
+    problem = assignment.problems[0]
+    for model in (assignment.authors[0], problem.authors[0], problem.grading, problem.grading.automated, problem,
+                  assignment.grading, assignment.meta, assignment.dates):
+        assert "Homework 1" not in repr(model)
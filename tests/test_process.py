@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import pytest
+
+from curricula.library import process
+
+
+@pytest.fixture
+def spilled():
+    paths = []
+    yield paths
+    for path in paths:
+        if path is not None and path.exists():
+            os.unlink(path)
+
+
+def test_run():
+    runtime = process.run("/bin/echo", "hello", timeout=5)
+    assert runtime.code == 0
+    assert runtime.stdout == b"hello\n"
+    assert runtime.usage is not None
+
+
+def test_output_limit_kills():
+    runtime = process.run("/usr/bin/yes", timeout=5, output_limit=10)
+    assert runtime.truncated
+    assert not runtime.timed_out
+    assert len(runtime.stdout) == 10
+
+
+def test_spill_keeps_small_output(spilled):
+    runtime = process.run("/bin/sh", "-c", "head -c 3000 /dev/zero", timeout=5, spill=True)
+    spilled.extend((runtime.stdout_path, runtime.stderr_path))
+    assert runtime.code == 0
+    assert not runtime.truncated
+    assert runtime.stdout_path.stat().st_size == 3000
+
+
+def test_spill_buffers_at_most_default(spilled):
+    size = process.SPILL_BUFFER + 1000
+    runtime = process.run("/bin/sh", "-c", f"head -c {size} /dev/zero", timeout=5, spill=True)
+    spilled.extend((runtime.stdout_path, runtime.stderr_path))
+    assert runtime.code == 0
+    assert runtime.truncated
+    assert len(runtime.stdout) == process.SPILL_BUFFER
+    assert runtime.stdout_path.stat().st_size == size
+
+
+def test_spill_limit_kills(spilled):
+    runtime = process.run("/usr/bin/yes", timeout=5, output_limit=10, spill=True, spill_limit=1 << 20)
+    spilled.extend((runtime.stdout_path, runtime.stderr_path))
+    assert runtime.truncated
+    assert not runtime.timed_out
+    assert runtime.stdout_path.stat().st_size == 1 << 20
+
+
+def test_run_many_with_limits():
+    specs = (process.ProcessSpec(args=("/bin/sh", "-c", f"echo {i}; ulimit -t"), timeout=5) for i in range(4))
+    limits = process.ProcessLimits(cpu=2)
+    results = sorted(runtime.stdout for runtime in process.run_many(specs, parallelism=2, limits=limits))
+    assert results == [f"{i}\n2\n".encode() for i in range(4)]
+
+
+def test_interactive_close_releases_pipes():
+    interactive = process.interact("/bin/cat")
+    interactive.stdin.write(b"hello")
+    runtime = interactive.close(timeout=5)
+    assert runtime.code == 0
+    assert runtime.stdout == b"hello\n"
+    assert interactive._process.stdout.closed
+    assert interactive._process.stderr.closed
+
+
+def test_async_run():
+    runtime = asyncio.run(process.async_run("/bin/cat", stdin=b"abc" * 100000, timeout=5))
+    assert runtime.code == 0
+    assert len(runtime.stdout) == 300000
+
+
+def test_async_run_timeout_keeps_output():
+    runtime = asyncio.run(process.async_run("/bin/sh", "-c", "echo partial; sleep 30 & sleep 30", timeout=0.5))
+    assert runtime.timed_out
+    assert runtime.stdout == b"partial\n"
+
+
+def test_async_interactive_timeout_keeps_output():
+    async def main():
+        interactive = await process.async_interact("/bin/sh", "-c", "echo partial; sleep 30 & sleep 30")
+        return await interactive.close(timeout=0.5)
+
+    runtime = asyncio.run(main())
+    assert runtime.timed_out
+    assert runtime.stdout == b"partial\n"
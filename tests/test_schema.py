@@ -0,0 +1,23 @@
+import pytest
+
+from curricula.library.schema import SchemaError
+from curricula.models import AssignmentGrading, ProblemGradingCategory
+
+
+def test_integral_float_is_accepted():
+    grading = AssignmentGrading.load(dict(points=100.0))
+    assert grading.points == 100
+    assert type(grading.points) is int
+
+
+@pytest.mark.parametrize("points", [100.5, "100", True])
+def test_invalid_integer_is_rejected(points):
+    with pytest.raises(SchemaError):
+        AssignmentGrading.load(dict(points=points))
+
+
+def test_load_does_not_modify_data():
+    data = dict(weight="1", points=10)
+    category = ProblemGradingCategory.load(data)
+    assert data == dict(weight="1", points=10)
+    assert str(category.points) == "10"
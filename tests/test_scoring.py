@@ -0,0 +1,92 @@
+import random
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from curricula.scoring import CATEGORIES, Scorer, to_decimal
+
+
+def enabled(problem):
+    for name in CATEGORIES:
+        category = getattr(problem.grading, name)
+        if category is not None and category.enabled:
+            yield name, category
+
+
+def exact(assignment, earned):
+    """Evaluate a rollup directly with fractions."""
+
+    total = sum(Fraction(problem.grading.weight) for problem in assignment.problems)
+    result = Fraction(0)
+    for problem in assignment.problems:
+        categories = list(enabled(problem))
+        weight_total = sum(Fraction(category.weight) for _, category in categories)
+        for name, category in categories:
+            if category.points == 0:
+                continue
+            result += (
+                Fraction(problem.grading.weight) / total
+                * Fraction(category.weight) / weight_total
+                * Fraction(earned.get((problem.short, name), 0)) / Fraction(category.points))
+    return result
+
+
+def test_category_percentages_match_models(assignment):
+    shares = Scorer.from_assignment(assignment).shares()
+    weight = Fraction(assignment.grading.weight())
+    for problem in assignment.problems:
+        for name, category in enabled(problem):
+            share = shares[problem.short, name] * Fraction(category.points)
+            percentage = getattr(problem.grading, f"percentage_{name}")
+            assert to_decimal(share * weight / Fraction(problem.grading.weight)) == percentage
+
+
+def test_problem_weights_match_models(assignment):
+    shares = Scorer.from_assignment(assignment).shares()
+    weight = assignment.grading.weight()
+    assert weight == Decimal("5.25")
+    for problem in assignment.problems:
+        share = sum(shares[problem.short, name] * Fraction(category.points) for name, category in enabled(problem))
+        assert to_decimal(share) == problem.grading.weight / weight
+
+
+def test_disabled_categories_are_not_scored(assignment):
+    scorer = Scorer.from_assignment(assignment)
+    assert ("p3", "review") not in scorer.keys
+    assert scorer.share(("p3", "review")) is None
+
+
+def test_rollups_are_exact(assignment):
+    scorer = Scorer.from_assignment(assignment)
+    generator = random.Random(0)
+    students = [{key: Decimal(generator.randint(0, 24)) / 2 for key in scorer.keys} for _ in range(50)]
+    scores = scorer.score_many(scorer.rows(students))
+    for earned, score in zip(students, scores):
+        assert score == exact(assignment, earned)
+        assert scorer.grade(scorer.row(earned)) == score * 100
+
+
+def test_full_marks(assignment):
+    scorer = Scorer.from_assignment(assignment)
+    earned = {(problem.short, name): category.points for problem in assignment.problems for name, category in enabled(problem)}
+    assert scorer.score(scorer.row(earned)) == 1
+
+
+def test_category_without_points(assignment):
+    assignment.problems[1].grading.manual.points = Decimal(0)
+    scorer = Scorer.from_assignment(assignment)
+    assert scorer.share(("p2", "manual")) == 0
+    assert assignment.problems[1].grading.percentage_manual == Decimal("0.7")
+
+    row = scorer.row({("p2", "manual"): 0, ("p1", "automated"): 10})
+    assert scorer.score(row) == exact(assignment, {("p1", "automated"): 10})
+
+
+def test_fixed_point_conversion(assignment):
+    scorer = Scorer.from_assignment(assignment)
+    assert scorer.fixed(3) == 3000
+    assert scorer.fixed("2.5") == 2500
+    assert scorer.fixed(Fraction(1, 4)) == 250
+    with pytest.raises(ValueError):
+        scorer.fixed(Decimal("1.2345"))
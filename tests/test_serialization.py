@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from curricula.library import serialization
+
+DOCUMENT = {"a": [1, 2.5, {"b": "text", "c": None}], "d": True, "é": "ü"}
+
+
+def dump(o, **options) -> str:
+    file = io.StringIO()
+    serialization.dump(o, file, **options)
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2, "\t"])
+def test_dump_matches_json(indent):
+    assert dump(DOCUMENT, indent=indent) == json.dumps(DOCUMENT, indent=indent)
+
+
+def test_dump_truncates_without_mutating():
+    o = {"long": "x" * (serialization.LIMIT + 10)}
+    data = json.loads(dump(o))
+    assert len(data["long"]) == serialization.LIMIT
+    assert data["long"].endswith("...")
+    assert len(o["long"]) == serialization.LIMIT + 10
+    assert json.loads(dump(o, no_truncate=True)) == o
+
+
+def test_dump_lines_round_trip():
+    file = io.StringIO()
+    serialization.dump_lines([DOCUMENT, [1, 2]], file)
+    file.seek(0)
+    assert list(serialization.load_lines(file)) == [DOCUMENT, [1, 2]]
+
+
+@pytest.fixture(params=["json", "orjson", "ujson"])
+def backend(request):
+    try:
+        yield serialization.use(request.param)
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+    finally:
+        serialization.use("json")
+
+
+def test_backends_agree(backend):
+    o = {"a": [1, 2.5, {"b": "x" * (serialization.LIMIT + 10)}], "k" * (serialization.LIMIT + 10): None}
+    assert json.loads(dump(o)) == json.loads(json.dumps(serialization.truncated(o, serialization.LIMIT)))
+    assert sorted(map(len, json.loads(dump(o)))) == [1, serialization.LIMIT]
+
+
+def test_backends_reject_dataclasses(backend):
+    from curricula.library.process import Runtime
+    with pytest.raises(TypeError):
+        dump({"runtime": Runtime(args=("a",), cwd=None)})
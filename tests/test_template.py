@@ -0,0 +1,48 @@
+import os
+import stat
+
+import pytest
+
+from curricula.library import template
+
+
+@pytest.fixture
+def templates(tmp_path):
+    path = tmp_path.joinpath("templates")
+    path.mkdir()
+    path.joinpath("hello.md").write_text("Hello [[ name ]], [[ 0.5 | percentage ]]")
+    return path
+
+
+def test_bytecode_cache_directory_is_private(tmp_path):
+    path = tmp_path.joinpath("cache", "jinja2")
+    umask = os.umask(0o002)
+    try:
+        assert template.jinja2_bytecode_cache(path) is not None
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o700
+
+
+def test_bytecode_cache_refuses_foreign_directory(tmp_path, monkeypatch):
+    path = tmp_path.joinpath("foreign")
+    path.mkdir()
+    monkeypatch.setattr(os, "getuid", lambda: path.stat().st_uid + 1)
+    assert template.jinja2_bytecode_cache(path) is None
+
+
+def test_environments_are_not_shared_by_default(templates, tmp_path):
+    cache = tmp_path.joinpath("cache")
+    first = template.jinja2_create_environment(templates, bytecode_cache_path=cache)
+    first.globals["leaked"] = True
+    second = template.jinja2_create_environment(templates, bytecode_cache_path=cache)
+    assert second is not first
+    assert "leaked" not in second.globals
+
+    shared = template.jinja2_create_environment(templates, bytecode_cache_path=cache, reuse=True)
+    assert template.jinja2_create_environment(templates, bytecode_cache_path=cache, reuse=True) is shared
+
+
+def test_render(templates, tmp_path):
+    configuration = template.TemplateConfiguration(templates, bytecode_cache_path=tmp_path.joinpath("cache"))
+    assert template.render(configuration, "template:hello.md", dict(name="World")) == "Hello World, 50%"
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from curricula.structure import Artifacts
+from curricula.workspace import Workspaces
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    """Artifacts addressed by relative paths."""
+
+    monkeypatch.chdir(tmp_path)
+    grading = tmp_path.joinpath("artifacts", "grading")
+    grading.joinpath("tests").mkdir(parents=True)
+    grading.joinpath("a.txt").write_text("a")
+    grading.joinpath("tests", "b.txt").write_text("b")
+    submission = tmp_path.joinpath("submission")
+    submission.mkdir()
+    submission.joinpath("main.cpp").write_text("main")
+    return Artifacts(Path("artifacts")), submission
+
+
+@pytest.mark.parametrize("mode", ["symlink", "hardlink"])
+def test_stage_with_relative_paths(artifacts, mode):
+    artifacts, submission = artifacts
+    workspaces = Workspaces(artifacts, Path("work"), mode=mode)
+    workspaces.update()
+
+    workspace = workspaces.stage("s1", submission)
+    assert workspace.path.joinpath("a.txt").read_text() == "a"
+    assert workspace.path.joinpath("main.cpp").read_text() == "main"
+
+    path = workspace.writable("tests/b.txt")
+    path.write_text("changed")
+    assert workspaces.snapshot.path.joinpath("tests", "b.txt").read_text() == "b"
+    workspace.cleanup()
+    assert not workspace.path.exists()